@@ -0,0 +1,289 @@
+"""ContextKeeper Backup - Online snapshots and incremental deltas."""
+
+import os
+import sqlite3
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable
+
+from compression import HEADER, forget_dictionaries, load_dictionaries
+from config import (
+    DB_TIMEOUT, SNAPSHOT_MAX_RESTARTS, SNAPSHOT_PAGES, SNAPSHOT_PAUSE, SNAPSHOT_TIMEOUT
+)
+from db_utils import (
+    MEMORY_FIELDS, create_blob_triggers, enable_compressed_view, get_connection
+)
+
+
+def _connect(path: Path) -> sqlite3.Connection:
+    return sqlite3.connect(str(path), timeout=DB_TIMEOUT)
+
+
+def _tmp_path(dest: Path) -> Path:
+    tmp = dest.with_name(dest.name + '.tmp')
+    if tmp.exists():
+        tmp.unlink()
+    return tmp
+
+
+class _Restarted(Exception):
+    """Raised from the backup progress callback to stop a paced copy."""
+
+
+def _copy_database(src: Path, dest: Path, pages: int, pause: float,
+                   max_restarts: int = SNAPSHOT_MAX_RESTARTS,
+                   timeout: float = SNAPSHOT_TIMEOUT) -> int:
+    """Copy src to dest with the backup API, ``pages`` at a time.
+
+    Locks on the source are only held while a step runs, and the pause
+    between steps lets writers get in. Every write to the source makes
+    SQLite start the copy over, so after ``max_restarts`` restarts the
+    rest is copied in a single step, which holds the source's read lock
+    until done but cannot be restarted. Raises TimeoutError after
+    ``timeout`` seconds. dest only appears once complete. Returns the
+    number of restarts.
+    """
+    dest = Path(dest)
+    tmp = _tmp_path(dest)
+    deadline = time.monotonic() + timeout
+    restarts = 0
+    last = None
+
+    def progress(status, remaining, total):
+        nonlocal restarts, last
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"Copying {src} took longer than {timeout}s")
+        if status != sqlite3.SQLITE_OK:
+            return
+        # A restart shows as a step that leaves more pages to go
+        if last is not None and remaining >= last:
+            restarts += 1
+            if restarts > max_restarts:
+                raise _Restarted
+        last = remaining
+        if remaining and pause:
+            time.sleep(pause)
+
+    source = _connect(src)
+    target = _connect(tmp)
+    try:
+        try:
+            source.backup(target, pages=pages, progress=progress)
+        except _Restarted:
+            source.backup(target, pages=-1, progress=progress)
+    except Exception:
+        target.close()
+        tmp.unlink()
+        raise
+    finally:
+        target.close()
+        source.close()
+    os.replace(tmp, dest)
+    return restarts
+
+
+def _is_delta(path: Path) -> bool:
+    conn = _connect(path)
+    try:
+        return conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'snapshot_meta'"
+        ).fetchone() is not None
+    finally:
+        conn.close()
+
+
+def snapshot_watermark(path: Path) -> int:
+    """Change-feed watermark a full snapshot or delta file is current to."""
+    is_delta = _is_delta(path)
+    conn = _connect(path)
+    try:
+        if is_delta:
+            return int(conn.execute(
+                "SELECT value FROM snapshot_meta WHERE key = 'watermark'"
+            ).fetchone()[0])
+        return conn.execute(
+            "SELECT COALESCE(MAX(seq), 0) FROM memory_changes"
+        ).fetchone()[0]
+    finally:
+        conn.close()
+
+
+def snapshot(db_path: Path, dest: Path, pages: int = SNAPSHOT_PAGES,
+             pause: float = SNAPSHOT_PAUSE, max_restarts: int = SNAPSHOT_MAX_RESTARTS,
+             timeout: float = SNAPSHOT_TIMEOUT) -> int:
+    """Take a full online snapshot of the database.
+
+    Returns the snapshot's watermark, for use with snapshot_delta.
+    If the source is written to mid-copy, SQLite restarts the copy, so
+    the snapshot is always consistent; under steady writes it finishes
+    in one step once ``max_restarts`` is used up (see _copy_database).
+    """
+    _copy_database(db_path, dest, pages, pause, max_restarts, timeout)
+    return snapshot_watermark(dest)
+
+
+def snapshot_delta(db_path: Path, dest: Path, since: int) -> int:
+    """Write the memories changed after watermark ``since`` to a delta file.
+
+    The delta holds the current state of every inserted or updated
+    memory, the compression dictionaries its content uses, the ids of
+    deleted ones, and the watermarks it spans. Returns the new watermark.
+    Raises ValueError if the change log has been pruned past ``since``.
+    """
+    dest = Path(dest)
+    tmp = _tmp_path(dest)
+    columns = ', '.join(MEMORY_FIELDS)
+
+    try:
+        with get_connection(db_path) as conn:
+            conn.execute("ATTACH DATABASE ? AS delta", (str(tmp),))
+            conn.execute(f"CREATE TABLE delta.memories AS SELECT {columns} FROM memories WHERE 0")
+            conn.execute(
+                "CREATE TABLE delta.compression_dicts AS SELECT * FROM compression_dicts WHERE 0"
+            )
+            conn.execute("CREATE TABLE delta.deleted (id INTEGER PRIMARY KEY)")
+            conn.execute("CREATE TABLE delta.snapshot_meta (key TEXT PRIMARY KEY, value TEXT)")
+
+            # One transaction, so rows and watermark come from the same state
+            conn.execute("BEGIN")
+            start, watermark = conn.execute(
+                """SELECT (SELECT MIN(seq) FROM memory_changes),
+                          (SELECT COALESCE(MAX(seq), 0) FROM memory_changes)"""
+            ).fetchone()
+            if start is not None and start - 1 > since:
+                raise ValueError(
+                    f"Changes after watermark {since} have been pruned; take a full snapshot"
+                )
+            changed = """SELECT DISTINCT memory_id FROM memory_changes
+                         WHERE seq > ? AND seq <= ?"""
+            conn.execute(
+                f"""INSERT INTO delta.memories
+                    SELECT {columns} FROM memories WHERE id IN ({changed})
+                    ORDER BY id""",
+                (since, watermark)
+            )
+            # Headers alone name the dictionaries, so blobs are not read whole
+            dict_ids = {
+                HEADER.unpack_from(header)[1] for (header,) in conn.execute(
+                    """SELECT substr(content, 1, ?) FROM delta.memories
+                       WHERE typeof(content) = 'blob'""",
+                    (HEADER.size,)
+                )
+            } - {0}
+            conn.execute(
+                f"""INSERT INTO delta.compression_dicts
+                    SELECT * FROM compression_dicts
+                    WHERE id IN ({', '.join('?' * len(dict_ids))})""",
+                sorted(dict_ids)
+            )
+            conn.execute(
+                f"""INSERT INTO delta.deleted
+                    SELECT memory_id FROM ({changed})
+                    WHERE memory_id NOT IN (SELECT id FROM memories)""",
+                (since, watermark)
+            )
+            conn.executemany(
+                "INSERT INTO delta.snapshot_meta (key, value) VALUES (?, ?)",
+                [('base_watermark', since), ('watermark', watermark),
+                 ('created_at', datetime.now().isoformat())]
+            )
+            conn.commit()
+            conn.execute("DETACH DATABASE delta")
+    except Exception:
+        if tmp.exists():
+            tmp.unlink()
+        raise
+
+    os.replace(tmp, dest)
+    return watermark
+
+
+def _align_log(conn, base: int, watermark: int):
+    """Make the change log of a restored database end at ``watermark``.
+
+    Replay logs one change per memory rather than one per source change,
+    so its entries are shifted up to end at the delta's watermark and
+    the AUTOINCREMENT counter is raised to match.
+    """
+    head = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM memory_changes").fetchone()[0]
+    if base < head < watermark:
+        # Negate first so the shift never collides with a row not yet moved
+        conn.execute("UPDATE memory_changes SET seq = -seq WHERE seq > ?", (base,))
+        conn.execute("UPDATE memory_changes SET seq = ? - seq WHERE seq < 0",
+                     (watermark - head,))
+    updated = conn.execute(
+        "UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = 'memory_changes'",
+        (watermark,)
+    ).rowcount
+    if not updated:
+        conn.execute(
+            "INSERT INTO sqlite_sequence (name, seq) VALUES ('memory_changes', ?)",
+            (watermark,)
+        )
+
+
+def restore(target: Path, base: Path, deltas: Iterable[Path] = (),
+            pages: int = SNAPSHOT_PAGES) -> int:
+    """Rebuild a database from a full snapshot plus deltas applied in order.
+
+    Each delta must start where the previous file left off. The restored
+    database replaces ``target`` in one step once complete, so do not run
+    this against a database that is in use. Returns the final watermark.
+    """
+    target = Path(target)
+    if _is_delta(base):
+        raise ValueError(f"{base} is a delta, not a full snapshot")
+    tmp = _tmp_path(target)
+    forget_dictionaries(str(tmp))
+    _copy_database(base, tmp, pages, 0)
+    watermark = snapshot_watermark(base)
+    assignments = ', '.join(f"{c} = excluded.{c}" for c in MEMORY_FIELDS if c != 'id')
+    columns = ', '.join(MEMORY_FIELDS)
+
+    try:
+        with get_connection(tmp) as conn:
+            # Deltas may add, change or delete compressed rows
+            create_blob_triggers(conn)
+            for delta in deltas:
+                conn.execute("ATTACH DATABASE ? AS delta", (str(delta),))
+                meta = dict(conn.execute("SELECT key, value FROM delta.snapshot_meta"))
+                if int(meta['base_watermark']) != watermark:
+                    raise ValueError(
+                        f"{delta} starts at watermark {meta['base_watermark']}, "
+                        f"expected {watermark}"
+                    )
+                # Dictionaries first, and cached from this connection, as
+                # the blob triggers decompress the content upserted below
+                if conn.execute(
+                    """SELECT 1 FROM delta.sqlite_master
+                       WHERE type = 'table' AND name = 'compression_dicts'"""
+                ).fetchone():
+                    conn.execute(
+                        """INSERT OR IGNORE INTO compression_dicts
+                           SELECT * FROM delta.compression_dicts"""
+                    )
+                    load_dictionaries(conn, str(tmp))
+                # Upsert (not REPLACE) so the FTS update trigger fires
+                conn.execute(
+                    f"""INSERT INTO memories ({columns})
+                        SELECT {columns} FROM delta.memories WHERE 1
+                        ON CONFLICT(id) DO UPDATE SET {assignments}"""
+                )
+                conn.execute("DELETE FROM memories WHERE id IN (SELECT id FROM delta.deleted)")
+                if conn.execute(
+                    "SELECT 1 FROM delta.memories WHERE typeof(content) = 'blob' LIMIT 1"
+                ).fetchone():
+                    enable_compressed_view(conn)
+                _align_log(conn, watermark, int(meta['watermark']))
+                watermark = int(meta['watermark'])
+                conn.commit()
+                conn.execute("DETACH DATABASE delta")
+    except Exception:
+        tmp.unlink()
+        raise
+
+    os.replace(tmp, target)
+    forget_dictionaries(str(tmp))
+    forget_dictionaries(str(target))
+    return watermark
@@ -0,0 +1,246 @@
+"""ContextKeeper Columnar - Immutable memory-mapped snapshots for fast reads.
+
+An export holds a slice of memories, newest first, in a columnar file:
+a fixed-width array of ids; importance as a type tag per row, integers
+in a fixed-width array and text or real values as strings; an offsets
+array, null mask and concatenated blob for each text column; and a
+sorted term table whose posting lists point at row numbers. Terms are
+the memory's keywords plus the words of its content.
+
+SnapshotReader maps the file read-only and works on memoryviews of it
+directly, so opening is just an mmap and only the rows actually
+returned are decoded into Memory records.
+"""
+
+import bisect
+import mmap
+import os
+import re
+import struct
+import sys
+from array import array
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from db_utils import Layout, Memory, get_connection, query_memories, MEMORY_FIELDS
+
+MAGIC = b'CKCOL003'
+HEADER = struct.Struct('<8sBQQ')  # magic, byte order, rows, terms
+SECTION = struct.Struct('<QQ')  # offset, length
+TEXT_COLUMNS = ('content', 'source', 'category', 'keywords', 'session_key', 'timestamp')
+SECTIONS = (
+    ('id', 'q'), ('importance', 'q'), ('importance.kinds', 'B'),
+    ('importance.offsets', 'Q'), ('importance.data', 'B'),
+    *((f'{c}.{part}', code) for c in TEXT_COLUMNS
+      for part, code in (('offsets', 'Q'), ('nulls', 'B'), ('data', 'B'))),
+    ('terms.offsets', 'Q'), ('terms.data', 'B'),
+    ('postings.offsets', 'Q'), ('postings', 'I'),
+)
+BYTE_ORDERS = {'little': 0, 'big': 1}
+# importance.kinds codes: the value's type as stored by SQLite, which keeps
+# values such as the extractor's 'high' as text
+IMPORTANCE_KINDS = (int, type(None), str, float)
+LAYOUT = Layout(MEMORY_FIELDS)
+TERM_PATTERN = re.compile(r'\w+')
+
+
+def _terms(memory: Memory) -> set:
+    terms = set(TERM_PATTERN.findall((memory['content'] or '').lower()))
+    if memory['keywords']:
+        terms.update(k.strip().lower() for k in memory['keywords'].split(',') if k.strip())
+    return terms
+
+
+def export_columnar(db_path: Path, dest: Path, days: Optional[int] = None,
+                    limit: Optional[int] = None) -> int:
+    """Write the most recent memories to a columnar snapshot file.
+
+    ``days`` and ``limit`` bound the slice. The file is written next to
+    dest and renamed into place. Returns the number of rows exported.
+    """
+    conditions, params = [], []
+    if days:
+        conditions.append("timestamp >= ?")
+        params.append((datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d %H:%M:%S'))
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+    params.append(limit if limit else -1)
+
+    columns = {name: array(code) for name, code in SECTIONS}
+    for c in (*TEXT_COLUMNS, 'importance'):
+        columns[f'{c}.offsets'].append(0)
+    postings: Dict[str, List[int]] = {}
+
+    with get_connection(db_path) as conn:
+        cursor = query_memories(
+            conn,
+            f"""SELECT {', '.join(MEMORY_FIELDS)} FROM memories {where}
+                ORDER BY timestamp DESC, id DESC LIMIT ?""",
+            params, db_path
+        )
+        for row_number, memory in enumerate(cursor):
+            columns['id'].append(memory['id'])
+            importance = memory['importance']
+            kind = IMPORTANCE_KINDS.index(type(importance))
+            columns['importance.kinds'].append(kind)
+            columns['importance'].append(importance if kind == 0 else 0)
+            if kind > 1:
+                columns['importance.data'].frombytes(str(importance).encode('utf-8'))
+            columns['importance.offsets'].append(len(columns['importance.data']))
+            for c in TEXT_COLUMNS:
+                value = memory[c]
+                columns[f'{c}.nulls'].append(value is None)
+                if value is not None:
+                    columns[f'{c}.data'].frombytes(str(value).encode('utf-8'))
+                columns[f'{c}.offsets'].append(len(columns[f'{c}.data']))
+            for term in _terms(memory):
+                postings.setdefault(term, []).append(row_number)
+
+    rows = len(columns['id'])
+    columns['terms.offsets'].append(0)
+    columns['postings.offsets'].append(0)
+    for term in sorted(postings):
+        columns['terms.data'].frombytes(term.encode('utf-8'))
+        columns['terms.offsets'].append(len(columns['terms.data']))
+        columns['postings'].extend(postings[term])
+        columns['postings.offsets'].append(len(columns['postings']))
+
+    dest = Path(dest)
+    tmp = dest.with_name(dest.name + '.tmp')
+    table_size = HEADER.size + SECTION.size * len(SECTIONS)
+    with open(tmp, 'wb') as f:
+        f.write(b'\0' * table_size)
+        table = []
+        for name, _ in SECTIONS:
+            # Keep every section 8-byte aligned
+            f.write(b'\0' * (-f.tell() % 8))
+            data = columns[name].tobytes()
+            table.append((f.tell(), len(data)))
+            f.write(data)
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, BYTE_ORDERS[sys.byteorder], rows, len(postings)))
+        for entry in table:
+            f.write(SECTION.pack(*entry))
+    os.replace(tmp, dest)
+    return rows
+
+
+class SnapshotReader:
+    """Read-only, memory-mapped access to a columnar snapshot.
+
+    Results have the same shape as QueryEngine's. Use as a context
+    manager, or call close() when done.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mmap)
+
+        magic, byte_order, self.rows, self.term_count = HEADER.unpack_from(self._view)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"{self.path} is not a columnar snapshot")
+        if byte_order != BYTE_ORDERS[sys.byteorder]:
+            self.close()
+            raise ValueError(f"{self.path} was written on a machine with another byte order")
+
+        self._sections = {}
+        for i, (name, code) in enumerate(SECTIONS):
+            offset, length = SECTION.unpack_from(self._view, HEADER.size + i * SECTION.size)
+            self._sections[name] = self._view[offset:offset + length].cast(code)
+
+    def __len__(self):
+        return self.rows
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """Release the mapping.
+
+        A postings() view still held by the caller keeps the file mapped
+        until that view is released.
+        """
+        for view in getattr(self, '_sections', {}).values():
+            view.release()
+        self._sections = {}
+        if self._view is not None:
+            self._view.release()
+            self._view = None
+            try:
+                self._mmap.close()
+            except BufferError:
+                # Unmapped once the last view onto it goes away
+                pass
+            self._mmap = None
+
+    def _text(self, column: str, row: int) -> Optional[str]:
+        if self._sections[f'{column}.nulls'][row]:
+            return None
+        offsets = self._sections[f'{column}.offsets']
+        data = self._sections[f'{column}.data']
+        return str(data[offsets[row]:offsets[row + 1]], 'utf-8')
+
+    def _importance(self, row: int):
+        kind = IMPORTANCE_KINDS[self._sections['importance.kinds'][row]]
+        if kind is int:
+            return self._sections['importance'][row]
+        if kind is type(None):
+            return None
+        offsets = self._sections['importance.offsets']
+        value = str(self._sections['importance.data'][offsets[row]:offsets[row + 1]], 'utf-8')
+        return kind(value)
+
+    def row(self, row: int) -> Memory:
+        """Decode one row (0 is the newest memory) into a Memory."""
+        values = []
+        for field in MEMORY_FIELDS:
+            if field in TEXT_COLUMNS:
+                values.append(self._text(field, row))
+            elif field == 'importance':
+                values.append(self._importance(row))
+            else:
+                values.append(self._sections[field][row])
+        return Memory(LAYOUT, tuple(values))
+
+    def _term(self, index: int) -> bytes:
+        offsets = self._sections['terms.offsets']
+        return bytes(self._sections['terms.data'][offsets[index]:offsets[index + 1]])
+
+    def postings(self, term: str) -> memoryview:
+        """Row numbers containing term, newest first (empty if unknown).
+
+        The view points into the mapped file; release it (or drop it)
+        when done, as it keeps the mapping alive past close().
+        """
+        key = term.lower().encode('utf-8')
+        # Binary search over the sorted term table without building a list
+        index = bisect.bisect_left(range(self.term_count), key, key=self._term)
+        offsets = self._sections['postings.offsets']
+        if index < self.term_count and self._term(index) == key:
+            return self._sections['postings'][offsets[index]:offsets[index + 1]]
+        return self._sections['postings'][0:0]
+
+    def search(self, query: str, limit: int = 10) -> List[Memory]:
+        """Memories containing every word of query, newest first."""
+        terms = [t for t in TERM_PATTERN.findall(query.lower())]
+        if not terms:
+            return []
+        lists = sorted((self.postings(t) for t in terms), key=len)
+        others = [set(p) for p in lists[1:]]
+        matches = []
+        for row in lists[0]:
+            if all(row in other for other in others):
+                matches.append(self.row(row))
+                if len(matches) >= limit:
+                    break
+        return matches
+
+    def get_recent(self, limit: int = 20) -> List[Memory]:
+        """Most recent memories."""
+        return [self.row(i) for i in range(min(limit, self.rows))]
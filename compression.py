@@ -0,0 +1,148 @@
+"""ContextKeeper Compression - zlib storage for large memory content.
+
+Content at or above COMPRESS_MIN_SIZE bytes is stored as a BLOB: a
+9-byte header (format, dictionary id, plaintext length) followed by a
+zlib stream, optionally primed with a shared dictionary trained from
+existing memories. Plain TEXT values pass through untouched, so
+compressed and uncompressed rows can live side by side.
+
+Only connections from db_utils.get_connection can decode compressed
+rows. ContextKeeper's write paths index them explicitly, as the stored
+FTS triggers skip them (see db_utils.index_compressed).
+"""
+
+import sqlite3
+import struct
+import zlib
+from collections import Counter
+from typing import Dict, Optional, Tuple
+
+from config import COMPRESS_MIN_SIZE, COMPRESS_LEVEL, DB_TIMEOUT
+
+HEADER = struct.Struct('>BII')  # format, dictionary id, plaintext length
+FORMAT_ZLIB = 1
+MAX_DICT_SIZE = 32768  # zlib only uses the last 32 KiB of a dictionary
+
+# Dictionaries never change once written, so they are cached per database
+# path (restoring over a path clears its entries; see forget_dictionaries)
+_dictionaries: Dict[Tuple[str, int], bytes] = {}
+
+
+def _dictionary(db_path: str, dict_id: int) -> bytes:
+    key = (db_path, dict_id)
+    if key not in _dictionaries:
+        conn = sqlite3.connect(db_path, timeout=DB_TIMEOUT)
+        try:
+            row = conn.execute(
+                "SELECT dict FROM compression_dicts WHERE id = ?", (dict_id,)
+            ).fetchone()
+        finally:
+            conn.close()
+        if row is None:
+            raise ValueError(f"Compression dictionary {dict_id} not found in {db_path}")
+        _dictionaries[key] = row[0]
+    return _dictionaries[key]
+
+
+def current_dictionary(conn, db_path: str) -> Optional[Tuple[int, bytes]]:
+    """Newest trained dictionary as (id, bytes), or None."""
+    row = conn.execute(
+        "SELECT id, dict FROM compression_dicts ORDER BY id DESC LIMIT 1"
+    ).fetchone()
+    if row is None:
+        return None
+    _dictionaries[(db_path, row[0])] = row[1]
+    return row[0], row[1]
+
+
+def load_dictionaries(conn, db_path: str) -> int:
+    """Cache every dictionary visible to conn, including uncommitted ones."""
+    rows = conn.execute("SELECT id, dict FROM compression_dicts").fetchall()
+    for dict_id, zdict in rows:
+        _dictionaries[(db_path, dict_id)] = zdict
+    return len(rows)
+
+
+def forget_dictionaries(db_path: str):
+    """Drop cached dictionaries for a database whose file was replaced."""
+    for key in [k for k in _dictionaries if k[0] == db_path]:
+        del _dictionaries[key]
+
+
+def compress(text: str, dictionary: Optional[Tuple[int, bytes]] = None):
+    """Encode content for storage.
+
+    Returns a compressed BLOB, or the text itself if it is below the
+    threshold or would not shrink.
+    """
+    if COMPRESS_MIN_SIZE is None or not isinstance(text, str):
+        return text
+    raw = text.encode('utf-8')
+    if len(raw) < COMPRESS_MIN_SIZE:
+        return text
+
+    dict_id, zdict = dictionary if dictionary else (0, None)
+    if zdict:
+        compressor = zlib.compressobj(COMPRESS_LEVEL, zdict=zdict)
+    else:
+        compressor = zlib.compressobj(COMPRESS_LEVEL)
+    body = compressor.compress(raw) + compressor.flush()
+    if HEADER.size + len(body) >= len(raw):
+        return text
+    return HEADER.pack(FORMAT_ZLIB, dict_id, len(raw)) + body
+
+
+def decompress(value, db_path: str, limit: Optional[int] = None):
+    """Decode a stored content value; text and NULL pass through.
+
+    With ``limit``, only enough of the stream to produce that many
+    characters is inflated.
+    """
+    if not isinstance(value, bytes):
+        return value if limit is None or value is None else value[:limit]
+
+    fmt, dict_id, raw_len = HEADER.unpack_from(value)
+    if fmt != FORMAT_ZLIB:
+        raise ValueError(f"Unknown content format {fmt}")
+    if dict_id:
+        decompressor = zlib.decompressobj(zdict=_dictionary(db_path, dict_id))
+    else:
+        decompressor = zlib.decompressobj()
+
+    if limit is None:
+        return decompressor.decompress(value[HEADER.size:]).decode('utf-8')
+    # UTF-8 needs at most 4 bytes per character
+    raw = decompressor.decompress(value[HEADER.size:], limit * 4)
+    return raw.decode('utf-8', errors='ignore')[:limit]
+
+
+def raw_length(value) -> int:
+    """Plaintext size in bytes of a stored content value."""
+    if isinstance(value, bytes):
+        return HEADER.unpack_from(value)[2]
+    return len(value.encode('utf-8')) if value is not None else 0
+
+
+def train_dictionary(samples, size: int = MAX_DICT_SIZE) -> bytes:
+    """Build a zlib preset dictionary from sample texts.
+
+    Frequent words and word pairs are packed with the most common ones
+    last, where zlib can reach them with the shortest distances.
+    """
+    counts = Counter()
+    for text in samples:
+        words = text.split()
+        counts.update(words)
+        counts.update(' '.join(pair) for pair in zip(words, words[1:]))
+
+    picked = []
+    used = 0
+    for token, count in counts.most_common():
+        if count < 2:
+            break
+        piece = token.encode('utf-8') + b' '
+        if used + len(piece) > size:
+            break
+        picked.append(piece)
+        used += len(piece)
+    return b''.join(reversed(picked))
@@ -14,6 +14,38 @@ DB_ISOLATION_LEVEL = None  # autocommit mode for SQLite
 FTS5_ENABLED = True
 MAX_SEARCH_RESULTS = 100
 
+# FTS5 merge tuning: defer segment merging during heavy ingest,
+# then restore SQLite's defaults once the load is done
+FTS_INGEST_PROFILE = {'automerge': 0, 'crisismerge': 64}
+FTS_DEFAULT_PROFILE = {'automerge': 4, 'crisismerge': 16}
+
+# Content compression: memories at least this many UTF-8 bytes are stored
+# zlib-compressed (None disables compression for new writes)
+COMPRESS_MIN_SIZE = 4096
+COMPRESS_LEVEL = 6
+
+# Multi-get settings
+GET_MANY_CHUNK = 500  # ids per IN (...) query
+MEMORY_CACHE_SIZE = 1024  # rows kept in MemoryStore's LRU cache
+
+# Change feed settings
+CHANGE_BATCH_SIZE = 500
+CHANGE_POLL_MIN = 0.05  # seconds, first wait between data_version checks
+CHANGE_POLL_MAX = 1.0  # seconds, backoff ceiling
+
+# Related-memory settings
+RELATED_EXPANSION = 5  # co-occurring keywords added per source keyword
+RELATED_POSTING_LIMIT = 2000  # newest postings read per keyword
+RELATED_MAX_DF = 0.2  # skip keywords found in more than this share of memories
+RELATED_REFRESH_LIMIT = 1000  # keyword-index backlog each MemoryStore write applies
+RELATED_REFRESH_BATCH = 5000  # change-log entries per keyword-index transaction
+
+# Snapshot settings
+SNAPSHOT_PAGES = 256  # pages copied per backup step
+SNAPSHOT_PAUSE = 0.01  # seconds to sleep between steps so writers can proceed
+SNAPSHOT_MAX_RESTARTS = 3  # paced copies restarted by writes before copying in one step
+SNAPSHOT_TIMEOUT = 600.0  # seconds before a snapshot gives up
+
 # Extraction settings
 MAX_KEYWORDS = 5
 STOP_WORDS = {
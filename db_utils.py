@@ -1,11 +1,125 @@
 """Shared database utilities for ContextKeeper."""
 
 import sqlite3
+from collections.abc import Mapping
 from contextlib import contextmanager
 from pathlib import Path
-from typing import Optional
+from typing import Any, Dict, Iterable, Iterator, List, Optional
 
-from config import DEFAULT_DB_PATH, DB_TIMEOUT
+from compression import decompress
+from config import (
+    DEFAULT_DB_PATH, DB_TIMEOUT, FTS_DEFAULT_PROFILE, FTS_INGEST_PROFILE
+)
+
+# Columns of the memories table, in schema order
+MEMORY_FIELDS = (
+    'id', 'content', 'source', 'category', 'keywords', 'importance',
+    'session_key', 'timestamp'
+)
+
+# The FTS index reads plaintext through the memories_text view, since
+# large memories are stored compressed (see compression.py). Until a
+# database holds compressed rows the view is a plain projection, so any
+# client can use snippet() and the like; after that it decompresses, and
+# only connections that register ck_decompress (from get_connection) can
+# read it. The stored schema never calls ck_decompress otherwise, so
+# other clients can still read and write plain rows.
+FTS_CONTENT_TABLE = 'memories_text'
+PLAIN_TEXT_VIEW = f"CREATE VIEW {FTS_CONTENT_TABLE} AS SELECT id, content FROM memories"
+COMPRESSED_TEXT_VIEW = (
+    f"CREATE VIEW {FTS_CONTENT_TABLE} AS SELECT id, "
+    "CASE WHEN typeof(content) = 'blob' THEN ck_decompress(content) ELSE content END "
+    "AS content FROM memories"
+)
+
+# Triggers that keep the external-content FTS index in sync with plain
+# (uncompressed) memories
+FTS_TRIGGERS = {
+    'memories_fts_insert': """
+        CREATE TRIGGER IF NOT EXISTS memories_fts_insert
+        AFTER INSERT ON memories
+        WHEN typeof(new.content) != 'blob'
+        BEGIN
+            INSERT INTO memories_fts(rowid, content) VALUES (new.id, new.content);
+        END
+    """,
+    'memories_fts_delete': """
+        CREATE TRIGGER IF NOT EXISTS memories_fts_delete
+        AFTER DELETE ON memories
+        WHEN typeof(old.content) != 'blob'
+        BEGIN
+            INSERT INTO memories_fts(memories_fts, rowid, content)
+            VALUES ('delete', old.id, old.content);
+        END
+    """,
+    'memories_fts_update': """
+        CREATE TRIGGER IF NOT EXISTS memories_fts_update
+        AFTER UPDATE ON memories
+        WHEN typeof(old.content) != 'blob' AND typeof(new.content) != 'blob'
+        BEGIN
+            INSERT INTO memories_fts(memories_fts, rowid, content)
+            VALUES ('delete', old.id, old.content);
+            INSERT INTO memories_fts(rowid, content) VALUES (new.id, new.content);
+        END
+    """,
+}
+
+# Compressed memories are indexed by the write paths that store them (see
+# index_compressed); compressing a row in place leaves its plaintext, and
+# so its index entry, unchanged. Restore upserts arbitrary rows, so it
+# installs these TEMP triggers on its own connection instead. Changes to
+# compressed rows made by other clients leave the index stale until
+# rebuild_fts runs.
+FTS_BLOB_TRIGGERS = {
+    'memories_fts_blob_insert': """
+        CREATE TEMP TRIGGER IF NOT EXISTS memories_fts_blob_insert
+        AFTER INSERT ON main.memories
+        WHEN typeof(new.content) = 'blob'
+        BEGIN
+            INSERT INTO memories_fts(rowid, content)
+            VALUES (new.id, ck_decompress(new.content));
+        END
+    """,
+    'memories_fts_blob_delete': """
+        CREATE TEMP TRIGGER IF NOT EXISTS memories_fts_blob_delete
+        AFTER DELETE ON main.memories
+        WHEN typeof(old.content) = 'blob'
+        BEGIN
+            INSERT INTO memories_fts(memories_fts, rowid, content)
+            VALUES ('delete', old.id, ck_decompress(old.content));
+        END
+    """,
+    'memories_fts_blob_update': """
+        CREATE TEMP TRIGGER IF NOT EXISTS memories_fts_blob_update
+        AFTER UPDATE ON main.memories
+        WHEN typeof(old.content) = 'blob' OR typeof(new.content) = 'blob'
+        BEGIN
+            INSERT INTO memories_fts(memories_fts, rowid, content)
+            VALUES ('delete', old.id, ck_decompress(old.content));
+            INSERT INTO memories_fts(rowid, content)
+            VALUES (new.id, ck_decompress(new.content));
+        END
+    """,
+}
+
+SNIPPET_TOKENS = 16
+
+
+# Per-database overrides for get_connection (see configure_connections)
+_connection_settings: Dict[str, Dict[str, Any]] = {}
+
+
+def configure_connections(db_path: Optional[Path] = None, timeout: Optional[float] = None,
+                          journal_mode: Optional[str] = None):
+    """Override connection settings for db_path in this process.
+
+    ``timeout`` replaces DB_TIMEOUT as the busy timeout. ``journal_mode``
+    is set on every connection, as only WAL persists in the database file.
+    Call with neither to restore the defaults.
+    """
+    path = str(Path(db_path) if db_path else DEFAULT_DB_PATH)
+    settings = {'timeout': timeout, 'journal_mode': journal_mode}
+    _connection_settings[path] = {k: v for k, v in settings.items() if v is not None}
 
 
 @contextmanager
@@ -13,10 +127,17 @@ def get_connection(db_path: Optional[Path] = None):
     """Get a database connection with proper settings."""
     path = Path(db_path) if db_path else DEFAULT_DB_PATH
     path.parent.mkdir(parents=True, exist_ok=True)
+    settings = _connection_settings.get(str(path), {})
     
-    conn = sqlite3.connect(str(path), timeout=DB_TIMEOUT)
+    conn = sqlite3.connect(str(path), timeout=settings.get('timeout', DB_TIMEOUT))
     conn.row_factory = sqlite3.Row
     conn.execute("PRAGMA foreign_keys = ON")
+    if 'journal_mode' in settings:
+        conn.execute(f"PRAGMA journal_mode = {settings['journal_mode']}")
+    conn.create_function(
+        'ck_decompress', 1, lambda value: decompress(value, str(path)),
+        deterministic=True
+    )
     
     try:
         yield conn
@@ -59,50 +180,468 @@ def init_database(db_path: Optional[Path] = None):
             ON memories(session_key)
         """)
         
-        # FTS5 virtual table for full-text search
+        # Shared zlib dictionaries for compressed content
         conn.execute("""
+            CREATE TABLE IF NOT EXISTS compression_dicts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                dict BLOB NOT NULL,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        # Earlier versions called ck_decompress from stored triggers, which
+        # broke writes from connections that do not register it
+        for (name,) in conn.execute("""
+            SELECT name FROM sqlite_master
+            WHERE type = 'trigger' AND sql LIKE '%ck_decompress%'
+        """).fetchall():
+            conn.execute(f"DROP TRIGGER {name}")
+        # Views from earlier versions are replaced with the current ones
+        view = conn.execute(
+            "SELECT sql FROM sqlite_master WHERE name = ?", (FTS_CONTENT_TABLE,)
+        ).fetchone()
+        if view is None or view[0] not in (PLAIN_TEXT_VIEW, COMPRESSED_TEXT_VIEW):
+            if view:
+                conn.execute(f"DROP VIEW {FTS_CONTENT_TABLE}")
+            conn.execute(
+                COMPRESSED_TEXT_VIEW if has_compressed(conn) else PLAIN_TEXT_VIEW
+            )
+
+        # Databases created before compression index memories directly
+        fts = conn.execute(
+            "SELECT sql FROM sqlite_master WHERE name = 'memories_fts'"
+        ).fetchone()
+        if fts and f"content='{FTS_CONTENT_TABLE}'" not in fts[0]:
+            migrate_fts(conn)
+
+        # FTS5 virtual table for full-text search
+        conn.execute(f"""
             CREATE VIRTUAL TABLE IF NOT EXISTS memories_fts USING fts5(
                 content,
-                content='memories',
+                content='{FTS_CONTENT_TABLE}',
                 content_rowid='id'
             )
         """)
         
         # Triggers to keep FTS index in sync
+        create_fts_triggers(conn)
+
+        # Change log for the change feed; seq is the consumers' watermark
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS memory_changes (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                memory_id INTEGER NOT NULL,
+                op TEXT NOT NULL
+            )
+        """)
+        for op, event, ref in (('insert', 'INSERT', 'new'),
+                               ('update', 'UPDATE', 'new'),
+                               ('delete', 'DELETE', 'old')):
+            conn.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS memory_changes_{op}
+                AFTER {event} ON memories
+                BEGIN
+                    INSERT INTO memory_changes(memory_id, op) VALUES ({ref}.id, '{op}');
+                END
+            """)
+        # Keyword inverted index and co-occurrence counts for related
+        # lookups, maintained from the change log by related.py
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS memory_keywords (
+                keyword TEXT NOT NULL,
+                memory_id INTEGER NOT NULL,
+                PRIMARY KEY (keyword, memory_id)
+            ) WITHOUT ROWID
+        """)
+        conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_memory_keywords_memory
+            ON memory_keywords(memory_id)
+        """)
         conn.execute("""
-            CREATE TRIGGER IF NOT EXISTS memories_fts_insert 
-            AFTER INSERT ON memories
-            BEGIN
-                INSERT INTO memories_fts(rowid, content) VALUES (new.id, new.content);
-            END
+            CREATE TABLE IF NOT EXISTS keyword_stats (
+                keyword TEXT PRIMARY KEY,
+                doc_count INTEGER NOT NULL
+            ) WITHOUT ROWID
         """)
         conn.execute("""
-            CREATE TRIGGER IF NOT EXISTS memories_fts_delete 
-            AFTER DELETE ON memories
-            BEGIN
-                INSERT INTO memories_fts(memories_fts, rowid, content) 
-                VALUES ('delete', old.id, old.content);
-            END
+            CREATE TABLE IF NOT EXISTS keyword_cooccurrence (
+                a TEXT NOT NULL,
+                b TEXT NOT NULL,
+                count INTEGER NOT NULL,
+                PRIMARY KEY (a, b)
+            ) WITHOUT ROWID
         """)
         conn.execute("""
-            CREATE TRIGGER IF NOT EXISTS memories_fts_update 
-            AFTER UPDATE ON memories
-            BEGIN
-                INSERT INTO memories_fts(memories_fts, rowid, content) 
-                VALUES ('delete', old.id, old.content);
-                INSERT INTO memories_fts(rowid, content) VALUES (new.id, new.content);
-            END
+            CREATE TABLE IF NOT EXISTS index_state (
+                name TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            )
         """)
 
+        # Seed the log for databases created before it existed (checked
+        # first so routine inits do not take a write lock). A log that was
+        # ever written has a sqlite_sequence entry, even if fully pruned.
+        needs_seed = conn.execute("""
+            SELECT NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = 'memory_changes')
+                   AND EXISTS (SELECT 1 FROM memories)
+        """).fetchone()[0]
+        if needs_seed:
+            conn.execute("""
+                INSERT INTO memory_changes(memory_id, op)
+                SELECT id, 'insert' FROM memories ORDER BY id
+            """)
+
+
+def migrate_fts(conn):
+    """Point an older FTS index at the plaintext view and rebuild it.
+
+    The index is recreated from scratch, which takes a while on large
+    databases but only happens once.
+    """
+    conn.execute("BEGIN IMMEDIATE")
+    drop_fts_triggers(conn)
+    conn.execute("DROP TABLE memories_fts")
+    conn.execute(f"""
+        CREATE VIRTUAL TABLE memories_fts USING fts5(
+            content,
+            content='{FTS_CONTENT_TABLE}',
+            content_rowid='id'
+        )
+    """)
+    create_fts_triggers(conn)
+    rebuild_fts(conn)
+    conn.commit()
+
+
+class Layout:
+    """Column names shared by every Memory from one result set."""
+
+    __slots__ = ('names', 'index')
+
+    def __init__(self, names):
+        self.names = tuple(names)
+        self.index = {name: i for i, name in enumerate(self.names)}
+
+    def __reduce__(self):
+        return Layout, (self.names,)
+
+
+class Memory(Mapping):
+    """A memory row: a tuple of values plus a shared column Layout.
+
+    Much smaller than a dict per row. Reads work like a read-only dict
+    (``m['content']``, ``m.get('category')``, ``dict(m)``) and as
+    attributes (``m.content``). Assigning a key outside the layout (e.g.
+    a score) stores it in a per-record extras dict. Use ``to_dict()``
+    where a real dict is needed, such as for JSON.
+    """
+
+    __slots__ = ('_layout', '_values', '_extra')
+
+    def __init__(self, layout: Layout, values, extra: Optional[dict] = None):
+        self._layout = layout
+        self._values = values
+        self._extra = extra
+
+    def __getitem__(self, key):
+        i = self._layout.index.get(key)
+        if i is not None:
+            return self._values[i]
+        if self._extra and key in self._extra:
+            return self._extra[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        i = self._layout.index.get(key)
+        if i is None:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[key] = value
+        else:
+            values = list(self._values)
+            values[i] = value
+            self._values = tuple(values)
+
+    def __getattr__(self, name):
+        # Private and dunder lookups (e.g. from copy or pickle, before the
+        # slots are set) must not reach the mapping
+        if name.startswith('_'):
+            raise AttributeError(name)
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __iter__(self):
+        yield from self._layout.names
+        if self._extra:
+            yield from self._extra
+
+    def __len__(self):
+        return len(self._layout.names) + (len(self._extra) if self._extra else 0)
+
+    def __repr__(self):
+        return f"Memory({self.to_dict()!r})"
+
+    def __reduce__(self):
+        return Memory, (self._layout, self._values, self._extra)
+
+    def __copy__(self):
+        return self.copy()
+
+    def copy(self) -> 'Memory':
+        """Shallow copy; the values tuple and layout are shared."""
+        return Memory(self._layout, self._values, dict(self._extra) if self._extra else None)
+
+    def to_dict(self) -> dict:
+        memory = dict(zip(self._layout.names, self._values))
+        if self._extra:
+            memory.update(self._extra)
+        return memory
+
+
+def memory_factory(db_path: Optional[Path] = None, truncate: Optional[int] = None):
+    """Cursor row factory producing Memory records with decompressed content."""
+    path = str(Path(db_path) if db_path else DEFAULT_DB_PATH)
+    layout = None
 
-def search_fts(query: str, limit: int = 50, db_path: Optional[Path] = None) -> list:
+    def factory(cursor, values):
+        # One factory serves one cursor, so the layout is built once
+        nonlocal layout
+        if layout is None:
+            layout = Layout(d[0] for d in cursor.description)
+        content = layout.index.get('content')
+        if content is not None and isinstance(values[content], bytes):
+            values = list(values)
+            values[content] = decompress(values[content], path, truncate)
+            values = tuple(values)
+        return Memory(layout, values)
+
+    return factory
+
+
+def query_memories(conn, sql: str, params=(), db_path: Optional[Path] = None,
+                   truncate: Optional[int] = None):
+    """Execute sql on conn, returning a cursor that yields Memory records."""
+    cursor = conn.cursor()
+    cursor.row_factory = memory_factory(db_path, truncate)
+    return cursor.execute(sql, params)
+
+
+def create_blob_triggers(conn):
+    """Create this connection's TEMP triggers for compressed rows."""
+    for sql in FTS_BLOB_TRIGGERS.values():
+        conn.execute(sql)
+
+
+def create_fts_triggers(conn):
+    """Create the FTS sync triggers if they are missing."""
+    for sql in FTS_TRIGGERS.values():
+        conn.execute(sql)
+
+
+def drop_fts_triggers(conn):
+    """Drop the FTS sync triggers (used while bulk loading)."""
+    for name in FTS_TRIGGERS:
+        conn.execute(f"DROP TRIGGER IF EXISTS main.{name}")
+
+
+def has_compressed(conn, high_water: int = 0) -> bool:
+    """Whether any memory with id > high_water is stored compressed."""
+    return bool(conn.execute(
+        "SELECT EXISTS (SELECT 1 FROM memories WHERE id > ? AND typeof(content) = 'blob')",
+        (high_water,)
+    ).fetchone()[0])
+
+
+def enable_compressed_view(conn):
+    """Switch the FTS content view to decompress, if it does not yet."""
+    view = conn.execute(
+        "SELECT sql FROM sqlite_master WHERE name = ?", (FTS_CONTENT_TABLE,)
+    ).fetchone()
+    if view and view[0] != COMPRESSED_TEXT_VIEW:
+        conn.execute(f"DROP VIEW {FTS_CONTENT_TABLE}")
+        conn.execute(COMPRESSED_TEXT_VIEW)
+
+
+def index_compressed(conn, high_water: int):
+    """Index compressed memories with id > high_water.
+
+    The stored triggers skip compressed rows, so write paths that insert
+    them call this in the same transaction. Also switches the content
+    view if any were found.
+    """
+    if not has_compressed(conn, high_water):
+        return
+    enable_compressed_view(conn)
+    conn.execute("""
+        INSERT INTO memories_fts(rowid, content)
+        SELECT id, ck_decompress(content) FROM memories
+        WHERE id > ? AND typeof(content) = 'blob' ORDER BY id
+    """, (high_water,))
+
+
+def set_fts_profile(conn, profile: dict):
+    """Apply FTS5 merge settings (e.g. automerge, crisismerge)."""
+    for option, value in profile.items():
+        conn.execute(
+            "INSERT INTO memories_fts(memories_fts, rank) VALUES (?, ?)",
+            (option, value)
+        )
+
+
+def catch_up_fts(conn, high_water: int = 0) -> int:
+    """Index every memory with id > high_water in one pass.
+
+    Returns the new high-water rowid.
+    """
+    conn.execute("""
+        INSERT INTO memories_fts(rowid, content)
+        SELECT id, ck_decompress(content) FROM memories WHERE id > ? ORDER BY id
+    """, (high_water,))
+    return conn.execute("SELECT COALESCE(MAX(id), 0) FROM memories").fetchone()[0]
+
+
+def rebuild_fts(conn):
+    """Rebuild the whole FTS index from the memories table.
+
+    The index is cleared and refilled straight from memories rather
+    than with FTS5's 'rebuild', so it does not depend on which content
+    view is installed.
+    """
+    conn.execute("INSERT INTO memories_fts(memories_fts) VALUES ('delete-all')")
+    catch_up_fts(conn)
+
+
+@contextmanager
+def bulk_load(db_path: Optional[Path] = None, rebuild: bool = False):
+    """Connection for bulk inserts with deferred FTS indexing.
+
+    The FTS sync triggers are suspended and the ingest merge profile is
+    applied for the duration of the block. On exit, rows above the
+    high-water rowid recorded on entry are indexed in a single pass (or
+    the whole index is rebuilt if ``rebuild`` is set), then the triggers
+    and default profile are restored. Everything runs in one transaction,
+    so other connections never see the triggers missing.
+
+    Only inserts are caught up incrementally; pass ``rebuild=True`` if the
+    block also updates or deletes rows.
+    """
+    with get_connection(db_path) as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        high_water = conn.execute(
+            "SELECT COALESCE(MAX(id), 0) FROM memories"
+        ).fetchone()[0]
+        drop_fts_triggers(conn)
+        set_fts_profile(conn, FTS_INGEST_PROFILE)
+
+        yield conn
+
+        if rebuild:
+            rebuild_fts(conn)
+            high_water = 0
+        else:
+            catch_up_fts(conn, high_water)
+        if has_compressed(conn, high_water):
+            enable_compressed_view(conn)
+        set_fts_profile(conn, FTS_DEFAULT_PROFILE)
+        create_fts_triggers(conn)
+
+
+def select_list(fields: Optional[Iterable[str]] = None, truncate: Optional[int] = None,
+                alias: str = '') -> str:
+    """Build the memories column list for a SELECT.
+
+    ``fields`` projects a subset of MEMORY_FIELDS and ``truncate`` cuts
+    plain content to that many characters inside SQLite. Compressed
+    content is returned whole for memory_factory to decode and cut.
+    """
+    fields = list(fields) if fields else list(MEMORY_FIELDS)
+    unknown = [f for f in fields if f not in MEMORY_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown memory fields: {', '.join(unknown)}")
+
+    prefix = f"{alias}." if alias else ''
+    columns = []
+    for field in fields:
+        if field == 'content' and truncate:
+            columns.append(
+                f"CASE WHEN typeof({prefix}content) = 'blob' THEN {prefix}content "
+                f"ELSE substr({prefix}content, 1, {int(truncate)}) END AS content"
+            )
+        else:
+            columns.append(f"{prefix}{field}")
+    return ', '.join(columns)
+
+
+def _fts_sql(fields: Optional[Iterable[str]] = None, truncate: Optional[int] = None,
+             snippet: bool = False) -> str:
+    """Build the FTS5 search statement (named parameters: query, limit)."""
+    columns = select_list(fields, truncate, 'm')
+    if snippet:
+        columns += f", snippet(memories_fts, 0, '[', ']', '...', {SNIPPET_TOKENS}) AS snippet"
+    return f"""
+        SELECT {columns} FROM memories m
+        JOIN memories_fts fts ON m.id = fts.rowid
+        WHERE memories_fts MATCH :query
+        ORDER BY rank
+        LIMIT :limit
+    """
+
+
+def iter_fts(query: str, limit: int = 50, db_path: Optional[Path] = None,
+             fields: Optional[Iterable[str]] = None, truncate: Optional[int] = None,
+             snippet: bool = False) -> Iterator[Memory]:
+    """Yield FTS5 matches as they come off the cursor.
+
+    With ``snippet`` set, each row also carries an FTS5 ``snippet()``
+    excerpt with the matched terms in [brackets].
+    """
+    sql = _fts_sql(fields, truncate, snippet)
+    with get_connection(db_path) as conn:
+        yield from query_memories(
+            conn, sql, {'query': query, 'limit': limit}, db_path, truncate
+        )
+
+
+def search_fts(query: str, limit: int = 50, db_path: Optional[Path] = None,
+               **projection) -> List[Memory]:
     """Search using FTS5 full-text search."""
+    return list(iter_fts(query, limit, db_path, **projection))
+
+
+def search_fts_many(queries: Iterable[str], limit: int = 50, db_path: Optional[Path] = None,
+                    dedupe: bool = False, fields: Optional[Iterable[str]] = None,
+                    truncate: Optional[int] = None, snippet: bool = False) -> List[List[Memory]]:
+    """Run several FTS5 searches over one connection.
+
+    Every query reuses the same statement text, so SQLite prepares it
+    once and serves the rest from the connection's statement cache.
+    Returns one result list per query, in order. With ``dedupe`` set, a
+    memory is only returned for the first query that matches it, and
+    later queries are topped up past the duplicates to ``limit`` rows.
+    """
+    if dedupe and fields and 'id' not in fields:
+        raise ValueError("dedupe requires the 'id' field")
+
+    sql = _fts_sql(fields, truncate, snippet)
+    seen = set()
+    results = []
     with get_connection(db_path) as conn:
-        cursor = conn.execute("""
-            SELECT m.* FROM memories m
-            JOIN memories_fts fts ON m.id = fts.rowid
-            WHERE memories_fts MATCH ?
-            ORDER BY rank
-            LIMIT ?
-        """, (query, limit))
-        return [dict(row) for row in cursor.fetchall()]
+        for query in queries:
+            cursor = query_memories(
+                conn, sql, {'query': query, 'limit': limit + len(seen) if dedupe else limit},
+                db_path, truncate
+            )
+            rows = []
+            for row in cursor:
+                if dedupe:
+                    if row['id'] in seen:
+                        continue
+                    seen.add(row['id'])
+                rows.append(row)
+                if len(rows) >= limit:
+                    break
+            # Reset the statement so the next query can reuse it
+            cursor.close()
+            results.append(rows)
+    return results
@@ -66,28 +66,23 @@ def determine_importance(text, category):
         return 'low'
 
 
-def process_text(text):
-    """Process text and return structured data."""
-    lines = text.strip().split('\n')
-    results = []
-    
-    for line in lines:
+def iter_extract(text):
+    """Yield (category, content, keywords, importance) for each non-blank line."""
+    for line in text.strip().split('\n'):
         line = line.strip()
         if not line:
             continue
-            
+
         category = categorize_content(line)
-        keywords = extract_keywords(line)
-        importance = determine_importance(line, category)
-        
-        results.append({
-            'category': category,
-            'content': line,
-            'keywords': keywords,
-            'importance': importance
-        })
-    
-    return results
+        yield category, line, extract_keywords(line), determine_importance(line, category)
+
+
+def process_text(text):
+    """Process text and return structured data."""
+    return [
+        {'category': category, 'content': line, 'keywords': keywords, 'importance': importance}
+        for category, line, keywords, importance in iter_extract(text)
+    ]
 
 
 def main():
@@ -10,8 +10,8 @@ from pathlib import Path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from config import DEFAULT_DB_PATH
-from db_utils import init_database
-from extractor import process_text
+from db_utils import Memory, init_database, select_list
+from extractor import iter_extract
 from storage import MemoryStore
 from query import QueryEngine
 from summary import SummaryGenerator
@@ -35,17 +35,14 @@ class ContextKeeper:
         if not text or not text.strip():
             return []
 
-        # Extract structured data
-        extracted = process_text(text)
-
-        # Save each item
+        # Extract and save each line
         saved_ids = []
-        for item in extracted:
+        for category, content, keywords, importance in iter_extract(text):
             memory_id = self.store.save(
-                content=item['content'],
-                category=item['category'],
-                keywords=','.join(item['keywords']),
-                importance=item['importance'],
+                content=content,
+                category=category,
+                keywords=','.join(keywords),
+                importance=importance,
                 source=source
             )
             saved_ids.append(memory_id)
@@ -69,11 +66,32 @@ class ContextKeeper:
         return self.query.get_recent(limit)
 
 
+def _json_default(value):
+    if isinstance(value, Memory):
+        return value.to_dict()
+    return str(value)
+
+
+def write_results(rows, fmt='json', out=None):
+    """Write result rows as a JSON array or as NDJSON, one row per line.
+
+    NDJSON is written as rows arrive, so large result sets are never
+    held in memory.
+    """
+    out = out or sys.stdout
+    if fmt == 'ndjson':
+        for row in rows:
+            out.write(json.dumps(row, default=_json_default) + '\n')
+    else:
+        out.write(json.dumps(list(rows), indent=2, default=_json_default) + '\n')
+
+
 def main():
     import argparse
 
     parser = argparse.ArgumentParser(description='ContextKeeper - Memory system')
-    parser.add_argument('action', choices=['save', 'search', 'summary', 'recent', 'init'],
+    parser.add_argument('action', choices=['save', 'search', 'summary', 'recent', 'init', 'tail',
+                                           'snapshot', 'restore', 'compress'],
                        help='Action to perform')
     parser.add_argument('--text', '-t', help='Text to save (for save action)')
     parser.add_argument('--query', '-q', help='Search query')
@@ -81,10 +99,37 @@ def main():
     parser.add_argument('--source', '-s', help='Filter by source')
     parser.add_argument('--days', '-d', type=int, default=7, help='Days for summary')
     parser.add_argument('--limit', '-l', type=int, default=10, help='Result limit')
+    parser.add_argument('--format', '-f', choices=['json', 'ndjson'], default='json',
+                       help='Output format for search/recent (ndjson streams rows)')
+    parser.add_argument('--fields', help='Comma-separated columns to return (e.g. id,content)')
+    parser.add_argument('--truncate', type=int, help='Cut content to N characters in SQLite')
+    parser.add_argument('--snippet', action='store_true',
+                       help='Add an FTS5 snippet of the matched text (search only)')
+    parser.add_argument('--since', type=int, default=0,
+                       help='Change-feed watermark to start after (for tail action)')
+    parser.add_argument('--follow', action='store_true',
+                       help='Keep waiting for new changes (for tail action)')
+    parser.add_argument('--output', '-o',
+                       help='Snapshot file to write (for snapshot action)')
+    parser.add_argument('--incremental', metavar='PREVIOUS',
+                       help='Previous snapshot or delta; write only newer changes')
+    parser.add_argument('--snapshots', nargs='+', metavar='FILE',
+                       help='Full snapshot followed by deltas (for restore action)')
+    parser.add_argument('--train', action='store_true',
+                       help='Train a shared dictionary first (for compress action)')
     parser.add_argument('--db', help='Database path (default: ~/.openclaw/workspace/contextkeeper/memory.db)')
 
     args = parser.parse_args()
 
+    if args.snippet and (args.action != 'search' or args.category or args.source):
+        parser.error("--snippet only applies to search without --category/--source")
+    fields = [f.strip() for f in args.fields.split(',')] if args.fields else None
+    try:
+        select_list(fields)
+    except ValueError as e:
+        parser.error(str(e))
+    projection = {'fields': fields, 'truncate': args.truncate}
+
     ck = ContextKeeper(args.db)
 
     if args.action == 'init':
@@ -105,24 +150,70 @@ def main():
             sys.exit(1)
 
         if args.category or args.source:
-            results = ck.search_filtered(
+            results = ck.query.iter_search_filtered(
                 args.query,
                 category=args.category,
                 source=args.source,
-                limit=args.limit
+                limit=args.limit,
+                **projection
             )
         else:
-            results = ck.search(args.query, args.limit)
+            results = ck.query.iter_search(
+                args.query, args.limit, snippet=args.snippet, **projection
+            )
 
-        print(json.dumps(results, indent=2, default=str))
+        write_results(results, args.format)
 
     elif args.action == 'summary':
         summary = ck.get_summary(args.days)
         print(summary)
 
     elif args.action == 'recent':
-        results = ck.list_recent(args.limit)
-        print(json.dumps(results, indent=2, default=str))
+        results = ck.query.iter_recent(args.limit, **projection)
+        write_results(results, args.format)
+
+    elif args.action == 'snapshot':
+        if not args.output:
+            print("Error: --output required for snapshot")
+            sys.exit(1)
+
+        watermark = ck.store.snapshot(args.output, since=args.incremental)
+        kind = 'Delta' if args.incremental else 'Snapshot'
+        print(f"{kind} written to {args.output} (watermark {watermark})")
+
+    elif args.action == 'restore':
+        if not args.snapshots:
+            print("Error: --snapshots required for restore")
+            sys.exit(1)
+
+        base, *deltas = args.snapshots
+        try:
+            watermark = ck.store.restore(base, deltas)
+        except ValueError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+        print(f"Restored {ck.db_path} from {len(args.snapshots)} file(s) (watermark {watermark})")
+
+    elif args.action == 'compress':
+        rewritten = ck.store.compress(train=args.train)
+        stats = ck.store.compression_stats()
+        print(f"Compressed {rewritten} memories")
+        print(f"Compressed rows: {stats['compressed_rows']} "
+              f"({stats['raw_bytes']} -> {stats['stored_bytes']} bytes, "
+              f"ratio {stats['ratio']:.2f}x)")
+        print(f"Uncompressed rows: {stats['plain_rows']} ({stats['plain_bytes']} bytes)")
+        print(f"Read latency per compressed row: fetch {stats['fetch_ms_per_row']:.3f} ms, "
+              f"decompress {stats['decompress_ms_per_row']:.3f} ms")
+
+    elif args.action == 'tail':
+        # Rows carry their seq, so consumers can resume with --since
+        batches = ck.store.follow(args.since, timeout=None if args.follow else 0)
+        try:
+            for batch in batches:
+                write_results(batch, 'ndjson')
+                sys.stdout.flush()
+        except KeyboardInterrupt:
+            pass
 
 
 if __name__ == '__main__':
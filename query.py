@@ -3,26 +3,35 @@
 import sys
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Iterable, Iterator
 
 from config import DEFAULT_DB_PATH
-from db_utils import get_connection, search_fts
+from db_utils import (
+    Memory, get_connection, search_fts, search_fts_many, iter_fts, select_list,
+    query_memories
+)
 
+QUERY_FIELDS = ('id', 'timestamp', 'source', 'category', 'content', 'keywords',
+                'importance', 'session_key')
 
-def search_memories(
+
+def iter_search_memories(
     keywords: List[str],
     category: Optional[str] = None,
     source: Optional[str] = None,
     min_importance: int = 1,
     limit: int = 50,
-    db_path: Path = None
-) -> List[Dict[str, Any]]:
-    """Search memories by keywords using FTS5 if available, fallback to LIKE."""
+    db_path: Path = None,
+    fields: Optional[Iterable[str]] = None,
+    truncate: Optional[int] = None
+) -> Iterator[Memory]:
+    """Yield keyword matches as they come off the cursor (see search_memories)."""
     path = db_path or DEFAULT_DB_PATH
 
     # If single keyword/query, use FTS5 for better performance
     if len(keywords) == 1 and not category and not source and min_importance <= 1:
-        return search_fts(keywords[0], limit, path)
+        yield from iter_fts(keywords[0], limit, path, fields=fields, truncate=truncate)
+        return
 
     # Complex query: use regular search with filters
     with get_connection(path) as conn:
@@ -32,7 +41,7 @@ def search_memories(
         if keywords:
             keyword_conditions = []
             for kw in keywords:
-                keyword_conditions.append("(content LIKE ? OR keywords LIKE ?)")
+                keyword_conditions.append("(ck_decompress(content) LIKE ? OR keywords LIKE ?)")
                 params.extend([f"%{kw}%", f"%{kw}%"])
             conditions.append(f"({' OR '.join(keyword_conditions)})")
 
@@ -51,7 +60,7 @@ def search_memories(
         where_clause = " AND ".join(conditions)
 
         query = f"""
-            SELECT id, timestamp, source, category, content, keywords, importance, session_key
+            SELECT {select_list(fields or QUERY_FIELDS, truncate)}
             FROM memories
             WHERE {where_clause}
             ORDER BY importance DESC, timestamp DESC
@@ -59,20 +68,42 @@ def search_memories(
         """
         params.append(limit)
 
-        cursor = conn.execute(query, params)
-        return [dict(row) for row in cursor.fetchall()]
+        yield from query_memories(conn, query, params, path, truncate)
 
 
-def get_recent_memories(limit: int = 100, db_path: Path = None) -> List[Dict[str, Any]]:
-    """Get recent memories."""
+def search_memories(
+    keywords: List[str],
+    category: Optional[str] = None,
+    source: Optional[str] = None,
+    min_importance: int = 1,
+    limit: int = 50,
+    db_path: Path = None,
+    **projection
+) -> List[Memory]:
+    """Search memories by keywords using FTS5 if available, fallback to LIKE."""
+    return list(iter_search_memories(
+        keywords, category, source, min_importance, limit, db_path, **projection
+    ))
+
+
+def iter_recent_memories(limit: int = 100, db_path: Path = None,
+                         fields: Optional[Iterable[str]] = None,
+                         truncate: Optional[int] = None) -> Iterator[Memory]:
+    """Yield recent memories as they come off the cursor."""
     with get_connection(db_path) as conn:
-        cursor = conn.execute(
-            """SELECT * FROM memories 
+        yield from query_memories(
+            conn,
+            f"""SELECT {select_list(fields, truncate)} FROM memories 
                ORDER BY timestamp DESC 
                LIMIT ?""",
-            (limit,)
+            (limit,), db_path, truncate
         )
-        return [dict(row) for row in cursor.fetchall()]
+
+
+def get_recent_memories(limit: int = 100, db_path: Path = None,
+                        **projection) -> List[Memory]:
+    """Get recent memories."""
+    return list(iter_recent_memories(limit, db_path, **projection))
 
 
 class QueryEngine:
@@ -81,24 +112,52 @@ class QueryEngine:
     def __init__(self, db_path: str = None):
         self.db_path = Path(db_path) if db_path else DEFAULT_DB_PATH
 
-    def search(self, query: str, limit: int = 10) -> List[Dict]:
+    def search(self, query: str, limit: int = 10) -> List[Memory]:
         """Search memories by query string using FTS5."""
         # Use FTS5 for full-text search (much faster than LIKE)
         return search_fts(query, limit, self.db_path)
 
+    def search_many(self, queries: List[str], limit: int = 10, dedupe: bool = False,
+                    **projection) -> List[List[Memory]]:
+        """Run several FTS5 searches in one round-trip, one result list per query."""
+        return search_fts_many(queries, limit, self.db_path, dedupe=dedupe, **projection)
+
+    def related(self, memory_id: int, k: int = 10) -> List[Memory]:
+        """Find memories related to memory_id by weighted keyword overlap."""
+        from related import related_memories
+        return related_memories(memory_id, k, self.db_path)
+
     def search_filtered(self, query: str, category: str = None,
                         source: str = None, min_importance: int = 1,
-                        limit: int = 10) -> List[Dict]:
+                        limit: int = 10) -> List[Memory]:
         """Search with filters."""
         keywords = query.split() if query else []
         return search_memories(
             keywords, category, source, min_importance, limit, self.db_path
         )
 
-    def get_recent(self, limit: int = 20) -> List[Dict]:
+    def get_recent(self, limit: int = 20) -> List[Memory]:
         """Get most recent memories."""
         return get_recent_memories(limit, self.db_path)
 
+    def iter_search(self, query: str, limit: int = 10, **projection) -> Iterator[Memory]:
+        """Stream FTS5 results; accepts fields, truncate and snippet."""
+        return iter_fts(query, limit, self.db_path, **projection)
+
+    def iter_search_filtered(self, query: str, category: str = None,
+                             source: str = None, min_importance: int = 1,
+                             limit: int = 10, **projection) -> Iterator[Memory]:
+        """Stream filtered search results; accepts fields and truncate."""
+        keywords = query.split() if query else []
+        return iter_search_memories(
+            keywords, category, source, min_importance, limit, self.db_path,
+            **projection
+        )
+
+    def iter_recent(self, limit: int = 20, **projection) -> Iterator[Memory]:
+        """Stream most recent memories; accepts fields and truncate."""
+        return iter_recent_memories(limit, self.db_path, **projection)
+
 
 def main():
     import argparse
@@ -113,9 +172,10 @@ def main():
 
     args = parser.parse_args()
 
+    # Only the first 100 characters are printed; one more tells us to add '...'
     if args.fts and args.keywords:
         # Use FTS5
-        results = search_fts(' '.join(args.keywords), args.limit)
+        results = search_fts(' '.join(args.keywords), args.limit, truncate=101)
     else:
         # Use regular search with filters
         results = search_memories(
@@ -123,7 +183,8 @@ def main():
             category=args.category,
             source=args.source,
             min_importance=args.min_importance,
-            limit=args.limit
+            limit=args.limit,
+            truncate=101
         )
 
     if not results:
@@ -0,0 +1,230 @@
+"""ContextKeeper Related - Keyword co-occurrence index for related memories.
+
+memory_keywords is an inverted index from keyword to memory id,
+keyword_stats holds document frequencies and keyword_cooccurrence
+counts how often two keywords tag the same memory (stored in both
+directions). All three are brought up to date from the memory_changes
+log, so inserts, updates and deletes from any writer are picked up
+without rescanning. MemoryStore writes apply a bounded slice of the log
+after each write (see MemoryStore.refresh_related); related_memories
+only reads the index.
+"""
+
+import heapq
+import math
+from itertools import permutations
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from config import (
+    GET_MANY_CHUNK, RELATED_EXPANSION, RELATED_MAX_DF, RELATED_POSTING_LIMIT,
+    RELATED_REFRESH_BATCH
+)
+from db_utils import get_connection
+from storage import KEYWORD_WATERMARK, load_memories
+
+DOC_COUNT = 'keyword_docs'
+
+
+def split_keywords(keywords: Optional[str]) -> Set[str]:
+    """Normalize a comma-separated keywords value into a set."""
+    if not keywords:
+        return set()
+    return {k.strip().lower() for k in keywords.split(',') if k.strip()}
+
+
+def _get_state(conn, name: str) -> int:
+    row = conn.execute("SELECT value FROM index_state WHERE name = ?", (name,)).fetchone()
+    return row[0] if row else 0
+
+
+def _set_state(conn, name: str, value: int):
+    conn.execute(
+        """INSERT INTO index_state (name, value) VALUES (?, ?)
+           ON CONFLICT(name) DO UPDATE SET value = excluded.value""",
+        (name, value)
+    )
+
+
+def _adjust(conn, keywords: Iterable[str], pairs: Iterable[tuple], delta: int):
+    """Add ``delta`` to document and co-occurrence counts, dropping zeros."""
+    keywords = [(k, delta) for k in keywords]
+    pairs = [(a, b, delta) for a, b in pairs]
+    conn.executemany(
+        """INSERT INTO keyword_stats (keyword, doc_count) VALUES (?, ?)
+           ON CONFLICT(keyword) DO UPDATE SET doc_count = doc_count + excluded.doc_count""",
+        keywords
+    )
+    conn.executemany(
+        """INSERT INTO keyword_cooccurrence (a, b, count) VALUES (?, ?, ?)
+           ON CONFLICT(a, b) DO UPDATE SET count = count + excluded.count""",
+        pairs
+    )
+    if delta < 0:
+        conn.executemany(
+            "DELETE FROM keyword_stats WHERE keyword = ? AND doc_count <= 0",
+            [(k,) for k, _ in keywords]
+        )
+        conn.executemany(
+            "DELETE FROM keyword_cooccurrence WHERE a = ? AND b = ? AND count <= 0",
+            [(a, b) for a, b, _ in pairs]
+        )
+
+
+def _apply_changes(conn, watermark: int, head: int) -> int:
+    """Index the memories changed in log entries (watermark, head]."""
+    memory_ids = [row[0] for row in conn.execute(
+        """SELECT DISTINCT memory_id FROM memory_changes
+           WHERE seq > ? AND seq <= ?""",
+        (watermark, head)
+    )]
+    docs = _get_state(conn, DOC_COUNT)
+    changed = 0
+
+    for start in range(0, len(memory_ids), GET_MANY_CHUNK):
+        chunk = memory_ids[start:start + GET_MANY_CHUNK]
+        marks = ', '.join('?' * len(chunk))
+        current = dict(conn.execute(
+            f"SELECT id, keywords FROM memories WHERE id IN ({marks})", chunk
+        ).fetchall())
+        indexed: Dict[int, Set[str]] = {}
+        for keyword, memory_id in conn.execute(
+            f"SELECT keyword, memory_id FROM memory_keywords WHERE memory_id IN ({marks})",
+            chunk
+        ):
+            indexed.setdefault(memory_id, set()).add(keyword)
+
+        for memory_id in chunk:
+            before = indexed.get(memory_id, set())
+            after = split_keywords(current.get(memory_id))
+            if before == after:
+                continue
+            changed += 1
+            removed, added = before - after, after - before
+            conn.executemany(
+                "DELETE FROM memory_keywords WHERE keyword = ? AND memory_id = ?",
+                [(k, memory_id) for k in removed]
+            )
+            conn.executemany(
+                "INSERT INTO memory_keywords (keyword, memory_id) VALUES (?, ?)",
+                [(k, memory_id) for k in added]
+            )
+            pairs_before = set(permutations(before, 2))
+            pairs_after = set(permutations(after, 2))
+            _adjust(conn, removed, pairs_before - pairs_after, -1)
+            _adjust(conn, added, pairs_after - pairs_before, 1)
+            docs += bool(after) - bool(before)
+
+    _set_state(conn, DOC_COUNT, docs)
+    return changed
+
+
+def refresh_keyword_index(db_path: Path = None, limit: Optional[int] = None,
+                          wait: bool = True, batch: int = RELATED_REFRESH_BATCH) -> int:
+    """Apply changes logged since the index was last refreshed.
+
+    ``limit`` caps how far past the index watermark one call goes,
+    leaving the rest for later calls. Changes are applied in write
+    transactions of at most ``batch`` log entries, so a long backlog
+    does not hold the write lock throughout; concurrent refreshes never
+    apply a change twice. Without ``wait``, a write lock held elsewhere
+    raises sqlite3.OperationalError at once rather than after the busy
+    timeout. Returns the number of memories whose keywords changed.
+    """
+    changed = 0
+    with get_connection(db_path) as conn:
+        head = conn.execute(
+            "SELECT COALESCE(MAX(seq), 0) FROM memory_changes"
+        ).fetchone()[0]
+        watermark = _get_state(conn, KEYWORD_WATERMARK)
+        if head <= watermark:
+            return 0
+        if limit:
+            head = min(head, watermark + limit)
+
+        if not wait:
+            conn.execute("PRAGMA busy_timeout = 0")
+        while True:
+            conn.execute("BEGIN IMMEDIATE")
+            watermark = _get_state(conn, KEYWORD_WATERMARK)
+            if watermark >= head:
+                conn.rollback()
+                return changed
+            end = min(head, watermark + batch)
+            changed += _apply_changes(conn, watermark, end)
+            _set_state(conn, KEYWORD_WATERMARK, end)
+            conn.commit()
+
+
+def related_memories(memory_id: int, k: int = 10, db_path: Path = None) -> List[Dict[str, Any]]:
+    """Find the k memories most related to memory_id by weighted keyword overlap.
+
+    Shared keywords count their IDF. Each source keyword also pulls in
+    its RELATED_EXPANSION strongest co-occurring keywords, weighted by
+    IDF times Jaccard similarity. Only the newest RELATED_POSTING_LIMIT
+    postings of each keyword are read, and keywords that are both very
+    common and past that limit are skipped. Candidates are ranked with a
+    bounded heap. Results are memory dicts with an added ``score``.
+
+    Answers from the index as it stands and never writes; changes not
+    yet applied by refresh_keyword_index are not reflected.
+    """
+    with get_connection(db_path) as conn:
+        source = [row[0] for row in conn.execute(
+            "SELECT keyword FROM memory_keywords WHERE memory_id = ?", (memory_id,)
+        )]
+        if not source:
+            return []
+        source_keywords = set(source)
+        docs = max(_get_state(conn, DOC_COUNT), 1)
+        common = max(RELATED_MAX_DF * docs, RELATED_POSTING_LIMIT)
+
+        def idf(doc_count):
+            return math.log(1 + docs / doc_count)
+
+        source_df = dict(conn.execute(
+            f"SELECT keyword, doc_count FROM keyword_stats "
+            f"WHERE keyword IN ({', '.join('?' * len(source))})",
+            source
+        ).fetchall())
+
+        weights: Dict[str, float] = {}
+        for keyword in source:
+            df = source_df.get(keyword, 0)
+            if not df or df > common:
+                continue
+            weights[keyword] = weights.get(keyword, 0) + idf(df)
+
+            for partner, together, partner_df in conn.execute(
+                """SELECT c.b, c.count, s.doc_count
+                   FROM keyword_cooccurrence c
+                   JOIN keyword_stats s ON s.keyword = c.b
+                   WHERE c.a = ?
+                   ORDER BY c.count DESC
+                   LIMIT ?""",
+                (keyword, RELATED_EXPANSION + len(source))
+            ):
+                if partner in source_keywords or partner_df > common:
+                    continue
+                jaccard = together / (df + partner_df - together)
+                weights[partner] = weights.get(partner, 0) + idf(partner_df) * jaccard
+
+        scores: Dict[int, float] = {}
+        for keyword, weight in weights.items():
+            for (candidate,) in conn.execute(
+                """SELECT memory_id FROM memory_keywords WHERE keyword = ?
+                   ORDER BY memory_id DESC LIMIT ?""",
+                (keyword, RELATED_POSTING_LIMIT)
+            ):
+                if candidate != memory_id:
+                    scores[candidate] = scores.get(candidate, 0) + weight
+
+    # Ties go to the newer memory
+    top = heapq.nlargest(k, scores.items(), key=lambda item: (item[1], item[0]))
+    rows = load_memories([candidate for candidate, _ in top], db_path)
+    related = []
+    for (_, score), row in zip(top, rows):
+        if row is not None:
+            row['score'] = score
+            related.append(row)
+    return related
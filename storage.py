@@ -1,12 +1,28 @@
 """ContextKeeper Storage - SQLite persistence layer."""
 
 import os
+import sqlite3
+import time
+from collections import OrderedDict
 from pathlib import Path
 from datetime import datetime
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Iterable, Iterator, Tuple
 
-from config import DEFAULT_DB_PATH
-from db_utils import get_connection, init_database
+from config import (
+    DEFAULT_DB_PATH, CHANGE_BATCH_SIZE, CHANGE_POLL_MIN, CHANGE_POLL_MAX,
+    GET_MANY_CHUNK, MEMORY_CACHE_SIZE, COMPRESS_MIN_SIZE, RELATED_REFRESH_LIMIT
+)
+from compression import (
+    HEADER, compress, decompress, current_dictionary, raw_length, train_dictionary
+)
+from db_utils import (
+    Memory, MEMORY_FIELDS, get_connection, init_database, bulk_load,
+    enable_compressed_view, index_compressed, query_memories
+)
+
+MEMORY_COLUMNS = ('content', 'source', 'category', 'keywords', 'importance', 'session_key')
+# index_state entry holding the keyword index's change-log watermark (see related.py)
+KEYWORD_WATERMARK = 'keyword_watermark'
 
 
 def save_memory(content: str, source: str = 'manual', category: str = None,
@@ -14,67 +30,433 @@ def save_memory(content: str, source: str = 'manual', category: str = None,
                 db_path: Path = None) -> int:
     """Save a memory to the database."""
     with get_connection(db_path) as conn:
+        value = _encode(conn, content, db_path)
         cursor = conn.execute(
             """INSERT INTO memories 
                (content, source, category, keywords, importance, session_key)
                VALUES (?, ?, ?, ?, ?, ?)""",
-            (content, source, category, keywords, importance, session_key)
+            (value, source, category, keywords, importance, session_key)
         )
+        if isinstance(value, bytes):
+            # The insert holds the write lock, so no other row can follow it
+            index_compressed(conn, cursor.lastrowid - 1)
         return cursor.lastrowid
 
 
-def load_memory(memory_id: int, db_path: Path = None) -> Optional[Dict[str, Any]]:
+def _path_key(db_path: Path = None) -> str:
+    return str(Path(db_path) if db_path else DEFAULT_DB_PATH)
+
+
+def _encode(conn, content: str, db_path: Path = None):
+    """Compress content for storage if it is over the size threshold."""
+    # Short content cannot reach the byte threshold; skip the dictionary lookup
+    if COMPRESS_MIN_SIZE is None or len(content) * 4 < COMPRESS_MIN_SIZE:
+        return content
+    return compress(content, current_dictionary(conn, _path_key(db_path)))
+
+
+def save_memories(memories: List[Dict[str, Any]], db_path: Path = None,
+                  bulk: bool = True) -> int:
+    """Save many memories in one transaction.
+
+    With ``bulk`` set, FTS indexing is deferred and caught up in a single
+    pass once all rows are in (see ``db_utils.bulk_load``).
+    Returns the number of rows inserted.
+    """
+    loader = bulk_load if bulk else get_connection
+    with loader(db_path) as conn:
+        if not bulk:
+            conn.execute("BEGIN IMMEDIATE")
+            high_water = conn.execute(
+                "SELECT COALESCE(MAX(id), 0) FROM memories"
+            ).fetchone()[0]
+        dictionary = current_dictionary(conn, _path_key(db_path))
+        rows = (
+            (compress(m['content'], dictionary), m.get('source', 'manual'),
+             m.get('category'), m.get('keywords'), m.get('importance', 5),
+             m.get('session_key'))
+            for m in memories
+        )
+        cursor = conn.executemany(
+            f"""INSERT INTO memories ({', '.join(MEMORY_COLUMNS)})
+                VALUES ({', '.join('?' * len(MEMORY_COLUMNS))})""",
+            rows
+        )
+        count = cursor.rowcount
+        if not bulk:
+            index_compressed(conn, high_water)
+    return count
+
+
+def load_memory(memory_id: int, db_path: Path = None) -> Optional[Memory]:
     """Load a specific memory by ID."""
     with get_connection(db_path) as conn:
-        row = conn.execute(
-            "SELECT * FROM memories WHERE id = ?",
-            (memory_id,)
+        return query_memories(
+            conn, "SELECT * FROM memories WHERE id = ?", (memory_id,), db_path
         ).fetchone()
-        return dict(row) if row else None
 
 
-def search_memories(query: str, limit: int = 50, db_path: Path = None) -> List[Dict[str, Any]]:
+class MemoryCache:
+    """Bounded, id-keyed LRU cache of memory rows.
+
+    Entries are invalidated from the memory_changes log: ``sync`` evicts
+    every id updated or deleted since the last sync, whichever
+    connection made the change. If those log entries have since been
+    pruned, the whole cache is dropped instead.
+    """
+
+    def __init__(self, maxsize: int = MEMORY_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.watermark = None
+        self._rows = OrderedDict()
+        self.hits = self.misses = self.evictions = self.invalidations = 0
+
+    def sync(self, conn):
+        """Evict rows changed since the last sync."""
+        # Separate subqueries, so each is a single index lookup
+        start, head = conn.execute(
+            """SELECT (SELECT MIN(seq) FROM memory_changes),
+                      (SELECT COALESCE(MAX(seq), 0) FROM memory_changes)"""
+        ).fetchone()
+        if self.watermark is None or (start is not None and start - 1 > self.watermark):
+            self._rows.clear()
+        elif head > self.watermark:
+            # Inserts never invalidate, so a bulk load costs only the filter
+            for (memory_id,) in conn.execute(
+                """SELECT memory_id FROM memory_changes
+                   WHERE seq > ? AND seq <= ? AND op != 'insert'""",
+                (self.watermark, head)
+            ):
+                if self._rows.pop(memory_id, None) is not None:
+                    self.invalidations += 1
+        self.watermark = head
+
+    def get(self, memory_id: int) -> Optional[Memory]:
+        row = self._rows.get(memory_id)
+        if row is None:
+            self.misses += 1
+            return None
+        self._rows.move_to_end(memory_id)
+        self.hits += 1
+        return row
+
+    def put(self, memory_id: int, row: Memory):
+        self._rows[memory_id] = row
+        self._rows.move_to_end(memory_id)
+        if len(self._rows) > self.maxsize:
+            self._rows.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self._rows.clear()
+        self.watermark = None
+
+    def stats(self) -> Dict[str, int]:
+        """Hit/miss/eviction/invalidation counters and current size."""
+        return {
+            'size': len(self._rows),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+        }
+
+
+def load_memories(memory_ids: Iterable[int], db_path: Path = None,
+                  cache: Optional[MemoryCache] = None) -> List[Optional[Memory]]:
+    """Load many memories by ID, preserving input order.
+
+    Missing ids come back as None. Ids not found in ``cache`` are fetched
+    over one connection in chunked ``IN (...)`` queries.
+    """
+    memory_ids = list(memory_ids)
+    found = {}
+    with get_connection(db_path) as conn:
+        if cache is not None:
+            cache.sync(conn)
+
+        missing = []
+        for memory_id in dict.fromkeys(memory_ids):
+            row = cache.get(memory_id) if cache is not None else None
+            if row is None:
+                missing.append(memory_id)
+            else:
+                found[memory_id] = row
+
+        for start in range(0, len(missing), GET_MANY_CHUNK):
+            chunk = missing[start:start + GET_MANY_CHUNK]
+            cursor = query_memories(
+                conn,
+                f"SELECT * FROM memories WHERE id IN ({', '.join('?' * len(chunk))})",
+                chunk, db_path
+            )
+            for row in cursor:
+                found[row['id']] = row
+                if cache is not None:
+                    cache.put(row['id'], row)
+
+    # Hand out copies so callers cannot mutate cached rows
+    return [found[i].copy() if i in found else None for i in memory_ids]
+
+
+def search_memories(query: str, limit: int = 50, db_path: Path = None) -> List[Memory]:
     """Search memories by content or keywords (legacy, uses LIKE)."""
     with get_connection(db_path) as conn:
-        cursor = conn.execute(
+        cursor = query_memories(
+            conn,
             """SELECT * FROM memories 
-               WHERE content LIKE ? OR keywords LIKE ?
+               WHERE ck_decompress(content) LIKE ? OR keywords LIKE ?
                ORDER BY timestamp DESC 
                LIMIT ?""",
-            (f"%{query}%", f"%{query}%", limit)
+            (f"%{query}%", f"%{query}%", limit), db_path
         )
-        return [dict(row) for row in cursor.fetchall()]
+        return cursor.fetchall()
 
 
-def get_recent_memories(limit: int = 100, days: int = None, db_path: Path = None) -> List[Dict[str, Any]]:
+def get_recent_memories(limit: int = 100, days: int = None, db_path: Path = None) -> List[Memory]:
     """Get recent memories, optionally filtered by days."""
     with get_connection(db_path) as conn:
         if days:
             from datetime import timedelta
             cutoff = (datetime.now() - timedelta(days=days)).isoformat()
-            cursor = conn.execute(
+            cursor = query_memories(
+                conn,
                 """SELECT * FROM memories 
                    WHERE timestamp >= ?
                    ORDER BY timestamp DESC 
                    LIMIT ?""",
-                (cutoff, limit)
+                (cutoff, limit), db_path
             )
         else:
-            cursor = conn.execute(
+            cursor = query_memories(
+                conn,
                 """SELECT * FROM memories 
                    ORDER BY timestamp DESC 
                    LIMIT ?""",
-                (limit,)
+                (limit,), db_path
             )
-        return [dict(row) for row in cursor.fetchall()]
+        return cursor.fetchall()
+
+
+def changes_since(watermark: int = 0, limit: int = CHANGE_BATCH_SIZE,
+                  db_path: Path = None) -> Tuple[List[Memory], int]:
+    """Fetch up to ``limit`` changes logged after ``watermark``.
+
+    Each row is the memory's current state plus ``seq`` and ``op``
+    ('insert', 'update' or 'delete'); deleted memories only carry their
+    ``id``. Returns the batch and the watermark to pass next time.
+    """
+    columns = ', '.join(f"m.{field}" for field in MEMORY_FIELDS if field != 'id')
+    with get_connection(db_path) as conn:
+        changes = query_memories(
+            conn,
+            f"""SELECT c.seq, c.op, c.memory_id AS id, {columns}
+               FROM memory_changes c
+               LEFT JOIN memories m ON m.id = c.memory_id
+               WHERE c.seq > ?
+               ORDER BY c.seq
+               LIMIT ?""",
+            (watermark, limit), db_path
+        ).fetchall()
+    return changes, (changes[-1]['seq'] if changes else watermark)
+
+
+def prune_changes(keep_after: int, db_path: Path = None) -> int:
+    """Delete change-log entries up to and including watermark ``keep_after``.
+
+    Pass the lowest watermark any feed consumer or delta chain still
+    needs. Entries the keyword index has not applied yet are kept, as is
+    the newest entry, which holds the log's head. Consumers left behind
+    the pruned point miss the deleted changes; MemoryCache starts over
+    and snapshot_delta refuses to start there. Returns the number of
+    entries deleted.
+    """
+    with get_connection(db_path) as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        head = conn.execute(
+            "SELECT COALESCE(MAX(seq), 0) FROM memory_changes"
+        ).fetchone()[0]
+        indexed = conn.execute(
+            "SELECT value FROM index_state WHERE name = ?", (KEYWORD_WATERMARK,)
+        ).fetchone()
+        upto = min(keep_after, indexed[0] if indexed else 0, head - 1)
+        return conn.execute(
+            "DELETE FROM memory_changes WHERE seq <= ?", (upto,)
+        ).rowcount
+
+
+def wait_for_changes(watermark: int, timeout: Optional[float] = None,
+                     db_path: Path = None) -> bool:
+    """Block until a change after ``watermark`` is logged or ``timeout`` passes.
+
+    Only ``PRAGMA data_version`` is read while idle, which is cheap and
+    changes whenever another connection commits; the change log is only
+    queried when it does. Waits back off from CHANGE_POLL_MIN to
+    CHANGE_POLL_MAX. Returns True if new changes are available.
+    """
+    deadline = None if timeout is None else time.monotonic() + timeout
+    delay = CHANGE_POLL_MIN
+    with get_connection(db_path) as conn:
+        version = None
+        while True:
+            current = conn.execute("PRAGMA data_version").fetchone()[0]
+            if current != version:
+                version = current
+                head = conn.execute(
+                    "SELECT COALESCE(MAX(seq), 0) FROM memory_changes"
+                ).fetchone()[0]
+                if head > watermark:
+                    return True
+                delay = CHANGE_POLL_MIN
+            else:
+                delay = min(delay * 2, CHANGE_POLL_MAX)
+
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                delay = min(delay, remaining)
+            time.sleep(delay)
+
+
+def compress_existing(db_path: Path = None, train: bool = False,
+                      sample_size: int = 2000, batch_size: int = 500) -> int:
+    """Compress stored memories that are over the size threshold.
+
+    With ``train`` set, a new shared dictionary is first trained from a
+    random sample of memories and already-compressed rows are re-encoded
+    with it. Works in id order, one transaction per batch, so it can run
+    against a live database. The plaintext is unchanged, so neither the
+    search index nor the change log records the rewrites. Returns the
+    number of rows rewritten.
+    """
+    if COMPRESS_MIN_SIZE is None:
+        return 0
+    path_key = _path_key(db_path)
+
+    if train:
+        with get_connection(db_path) as conn:
+            samples = [
+                decompress(row[0], path_key) for row in conn.execute(
+                    "SELECT content FROM memories ORDER BY random() LIMIT ?",
+                    (sample_size,)
+                )
+            ]
+            zdict = train_dictionary(samples)
+            if zdict:
+                conn.execute("INSERT INTO compression_dicts (dict) VALUES (?)", (zdict,))
+
+    rewritten = 0
+    last_id = 0
+    while True:
+        with get_connection(db_path) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            head = conn.execute(
+                "SELECT COALESCE(MAX(seq), 0) FROM memory_changes"
+            ).fetchone()[0]
+            dictionary = current_dictionary(conn, path_key)
+            dict_id = dictionary[0] if dictionary else 0
+            rows = conn.execute(
+                """SELECT id, content FROM memories
+                   WHERE id > ?
+                     AND (typeof(content) = 'blob'
+                          OR length(CAST(content AS BLOB)) >= ?)
+                   ORDER BY id LIMIT ?""",
+                (last_id, COMPRESS_MIN_SIZE, batch_size)
+            ).fetchall()
+            if not rows:
+                break
+
+            changed = False
+            for memory_id, content in rows:
+                last_id = memory_id
+                if isinstance(content, bytes) and HEADER.unpack_from(content)[1] == dict_id:
+                    continue
+                encoded = compress(decompress(content, path_key), dictionary)
+                if encoded != content:
+                    conn.execute(
+                        "UPDATE memories SET content = ? WHERE id = ?", (encoded, memory_id)
+                    )
+                    rewritten += 1
+                    changed = True
+            if changed:
+                enable_compressed_view(conn)
+                conn.execute("DELETE FROM memory_changes WHERE seq > ?", (head,))
+
+    return rewritten
+
+
+def compression_stats(db_path: Path = None, sample: int = 200) -> Dict[str, Any]:
+    """Report storage savings and the read cost of compressed content.
+
+    Sizes come from blob headers, so nothing is decompressed except a
+    sample of up to ``sample`` rows used to time fetch and decompression.
+    """
+    path_key = _path_key(db_path)
+    with get_connection(db_path) as conn:
+        compressed_rows, stored_bytes = conn.execute(
+            """SELECT COUNT(*), COALESCE(SUM(length(content)), 0) FROM memories
+               WHERE typeof(content) = 'blob'"""
+        ).fetchone()
+        plain_rows, plain_bytes = conn.execute(
+            """SELECT COUNT(*), COALESCE(SUM(length(CAST(content AS BLOB))), 0)
+               FROM memories WHERE typeof(content) != 'blob'"""
+        ).fetchone()
+        raw_bytes = sum(raw_length(row[0]) for row in conn.execute(
+            f"""SELECT substr(content, 1, {HEADER.size}) FROM memories
+                WHERE typeof(content) = 'blob'"""
+        ))
+
+        started = time.perf_counter()
+        blobs = [row[0] for row in conn.execute(
+            "SELECT content FROM memories WHERE typeof(content) = 'blob' LIMIT ?",
+            (sample,)
+        )]
+        fetch_time = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for blob in blobs:
+        decompress(blob, path_key)
+    decompress_time = time.perf_counter() - started
+
+    per_row = 1000 / len(blobs) if blobs else 0
+    return {
+        'compressed_rows': compressed_rows,
+        'plain_rows': plain_rows,
+        'raw_bytes': raw_bytes,
+        'stored_bytes': stored_bytes,
+        'plain_bytes': plain_bytes,
+        'ratio': raw_bytes / stored_bytes if stored_bytes else 1.0,
+        'fetch_ms_per_row': fetch_time * per_row,
+        'decompress_ms_per_row': decompress_time * per_row,
+    }
+
+
+def _parse_importance(importance) -> int:
+    """Coerce an importance value to an int, defaulting to 5."""
+    if importance:
+        try:
+            return int(importance) if str(importance).isdigit() else 5
+        except (ValueError, TypeError):
+            pass
+    return 5
 
 
 # High-level interface for main.py
 class MemoryStore:
-    """High-level interface for memory operations."""
+    """High-level interface for memory operations.
+
+    Each save also applies that many keyword-index change-log entries
+    plus up to ``related_refresh`` more, oldest first, so a backlog left
+    by other writers drains over later saves (see refresh_related).
+    """
 
-    def __init__(self, db_path: str = None):
+    def __init__(self, db_path: str = None, cache_size: int = MEMORY_CACHE_SIZE,
+                 related_refresh: int = RELATED_REFRESH_LIMIT):
         self.db_path = Path(db_path) if db_path else DEFAULT_DB_PATH
+        self.cache = MemoryCache(cache_size)
+        self.related_refresh = related_refresh
 
     def init(self):
         """Initialize database (create tables and indexes)."""
@@ -83,36 +465,126 @@ class MemoryStore:
     def save(self, content: str, category: str = None, keywords: str = None,
              importance: str = None, source: str = 'manual', session_key: str = None) -> int:
         """Save a memory with metadata."""
-        imp = 5
-        if importance:
-            try:
-                imp = int(importance) if str(importance).isdigit() else 5
-            except (ValueError, TypeError):
-                pass
-
-        return save_memory(
+        memory_id = save_memory(
             content=content,
             source=source,
             category=category,
             keywords=keywords,
-            importance=imp,
+            importance=_parse_importance(importance),
             session_key=session_key,
             db_path=self.db_path
         )
+        self._catch_up_related(1)
+        return memory_id
+
+    def save_many(self, memories: List[Dict], bulk: bool = True) -> int:
+        """Bulk-save memories, deferring FTS indexing until the end."""
+        rows = [dict(m, importance=_parse_importance(m.get('importance'))) for m in memories]
+        count = save_memories(rows, self.db_path, bulk=bulk)
+        self._catch_up_related(count)
+        return count
+
+    def refresh_related(self, limit: Optional[int] = None) -> int:
+        """Bring the keyword index used by related() up to date.
+
+        Applies at most ``limit`` change-log entries if given. Returns
+        the number of memories whose keywords changed.
+        """
+        # related imports this module, so import it here
+        from related import refresh_keyword_index
+        return refresh_keyword_index(self.db_path, limit)
+
+    def _catch_up_related(self, written: int):
+        from related import refresh_keyword_index
+        try:
+            refresh_keyword_index(self.db_path, written + self.related_refresh, wait=False)
+        except sqlite3.OperationalError:
+            # Another writer holds the lock; a later save catches up
+            pass
+
+    def changes_since(self, watermark: int = 0,
+                      limit: int = CHANGE_BATCH_SIZE) -> Tuple[List[Memory], int]:
+        """Fetch a batch of changes after a watermark (see changes_since)."""
+        return changes_since(watermark, limit, self.db_path)
+
+    def prune_changes(self, keep_after: int) -> int:
+        """Drop change-log entries no consumer needs (see prune_changes)."""
+        return prune_changes(keep_after, self.db_path)
+
+    def follow(self, watermark: int = 0, limit: int = CHANGE_BATCH_SIZE,
+               timeout: Optional[float] = None) -> Iterator[List[Memory]]:
+        """Yield change batches forever, blocking while there are none.
 
-    def get(self, memory_id: int) -> Optional[Dict]:
+        Stops once ``timeout`` seconds pass without a new change.
+        """
+        while True:
+            changes, watermark = self.changes_since(watermark, limit)
+            if changes:
+                yield changes
+                continue
+            if not wait_for_changes(watermark, timeout, self.db_path):
+                return
+
+    def snapshot(self, dest: str, since=None) -> int:
+        """Write an online snapshot of the database to dest.
+
+        With ``since`` (a watermark, or the path of the previous snapshot
+        or delta), only the memories changed after it are written, as a
+        delta file. Returns the new watermark.
+        """
+        import backup
+        if since is None:
+            return backup.snapshot(self.db_path, Path(dest))
+        if not isinstance(since, int):
+            since = backup.snapshot_watermark(Path(since))
+        return backup.snapshot_delta(self.db_path, Path(dest), since)
+
+    def restore(self, base: str, deltas: List[str] = ()) -> int:
+        """Replace this database with a snapshot plus deltas replayed in order."""
+        import backup
+        watermark = backup.restore(self.db_path, Path(base), [Path(d) for d in deltas])
+        # Snapshots taken before a schema change are upgraded in place
+        self.init()
+        self.cache.clear()
+        self.refresh_related()
+        return watermark
+
+    def export_columnar(self, dest: str, days: int = None, limit: int = None) -> int:
+        """Export recent memories to a read-only columnar file for SnapshotReader."""
+        from columnar import export_columnar
+        return export_columnar(self.db_path, Path(dest), days=days, limit=limit)
+
+    def compress(self, train: bool = False) -> int:
+        """Compress large stored memories (see compress_existing)."""
+        rewritten = compress_existing(self.db_path, train=train)
+        self.cache.clear()
+        return rewritten
+
+    def compression_stats(self) -> Dict[str, Any]:
+        """Compression ratio and read-latency figures."""
+        return compression_stats(self.db_path)
+
+    def get(self, memory_id: int) -> Optional[Memory]:
         """Get a memory by ID."""
-        return load_memory(memory_id, self.db_path)
+        return self.get_many([memory_id])[0]
+
+    def get_many(self, memory_ids: Iterable[int]) -> List[Optional[Memory]]:
+        """Get memories by ID in input order (None for unknown ids), via the cache."""
+        return load_memories(memory_ids, self.db_path, self.cache)
+
+    def cache_stats(self) -> Dict[str, int]:
+        """Statistics for the id-keyed memory cache."""
+        return self.cache.stats()
 
-    def list_all(self, limit: int = 100) -> List[Dict]:
+    def list_all(self, limit: int = 100) -> List[Memory]:
         """List all memories."""
         return get_recent_memories(limit=limit, db_path=self.db_path)
 
-    def search(self, query: str, limit: int = 50) -> List[Dict]:
+    def search(self, query: str, limit: int = 50) -> List[Memory]:
         """Search memories."""
         return search_memories(query, limit, self.db_path)
 
-    def search_fts(self, query: str, limit: int = 50) -> List[Dict]:
+    def search_fts(self, query: str, limit: int = 50) -> List[Memory]:
         """Search using FTS5 full-text search."""
         from db_utils import search_fts
         return search_fts(query, limit, self.db_path)
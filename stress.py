@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+"""ContextKeeper Stress - Concurrency and lock-contention load generator.
+
+Spawns writer and reader processes against one shared database and
+reports throughput, latency percentiles, SQLITE_BUSY retries and time
+spent blocked. Blocked time is each operation's wall time minus its
+CPU time, so it covers SQLite's busy-timeout waits, the harness's own
+retry backoff and waits on disk I/O.
+"""
+
+import json
+import multiprocessing
+import queue
+import random
+import sqlite3
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+import db_utils
+from config import DB_TIMEOUT
+
+WORDS = [
+    'python', 'sqlite', 'meeting', 'deadline', 'bug', 'idea', 'project',
+    'database', 'search', 'release', 'review', 'backend', 'frontend',
+    'urgent', 'question', 'design', 'token', 'agent', 'memory', 'summary',
+]
+OPENERS = ['We discussed', 'Need to fix', 'Idea about', 'Question on', 'Notes on']
+WORKER_GRACE = 30.0  # seconds past the deadline before a silent worker counts as crashed
+
+
+def _sentence(rng: random.Random) -> str:
+    words = rng.sample(WORDS, 6)
+    return f"{rng.choice(OPENERS)} {' '.join(words)}"
+
+
+def _is_busy(error: sqlite3.OperationalError) -> bool:
+    name = getattr(error, 'sqlite_errorname', '')
+    return name in ('SQLITE_BUSY', 'SQLITE_LOCKED') or 'locked' in str(error)
+
+
+def _parse_mix(mix: str) -> List[tuple]:
+    """Parse 'search=8,summary=2' into [(op, weight), ...]."""
+    ops = []
+    for part in mix.split(','):
+        op, _, weight = part.partition('=')
+        if op not in ('search', 'summary'):
+            raise ValueError(f"Unknown read op: {op}")
+        ops.append((op, float(weight or 1)))
+    return ops
+
+
+def _worker(role: str, index: int, options: Dict[str, Any], results):
+    """Run one writer or reader until the deadline and report its stats."""
+    from extractor import iter_extract
+    from main import ContextKeeper
+
+    if index < options['crash_workers']:
+        raise RuntimeError(f"Injected crash in worker {index}")
+
+    rng = random.Random(options['seed'] * 1000 + index)
+    # With a zero busy timeout SQLite fails fast, so every SQLITE_BUSY is
+    # counted and retried below; rollback journal modes only hold per
+    # connection, so every connection sets the mode under test
+    db_utils.configure_connections(
+        options['db_path'], timeout=options['busy_timeout'],
+        journal_mode=options['journal_mode']
+    )
+    ck = ContextKeeper(options['db_path'])
+    mix = _parse_mix(options['mix'])
+    rate = options['write_rate'] if role == 'writer' else options['read_rate']
+    interval = 1.0 / rate if rate else 0
+
+    latencies: Dict[str, List[float]] = {}
+    blocked: Dict[str, float] = {}
+    busy_retries = 0
+    backoff_wait = 0.0
+    errors = 0
+    deadline = options['start'] + options['duration']
+
+    def attempt(call) -> bool:
+        """Run call, retrying on SQLITE_BUSY; False if it gave up."""
+        nonlocal busy_retries, backoff_wait, errors
+        backoff = 0.001
+        while True:
+            try:
+                call()
+                return True
+            except sqlite3.OperationalError as e:
+                if not _is_busy(e) or time.monotonic() >= deadline:
+                    errors += 1
+                    return False
+                busy_retries += 1
+                sleep = backoff * (0.5 + rng.random())
+                time.sleep(sleep)
+                backoff_wait += sleep
+                backoff = min(backoff * 2, 0.1)
+
+    time.sleep(max(0, options['start'] - time.monotonic()))
+    next_at = time.monotonic()
+
+    while time.monotonic() < deadline:
+        # Each call is one transaction, so retrying it after SQLITE_BUSY
+        # can never write a row twice
+        if role == 'writer':
+            op = 'save'
+            text = '\n'.join(_sentence(rng) for _ in range(options['lines']))
+            rows = [
+                {'content': content, 'category': category, 'keywords': ','.join(keywords),
+                 'importance': importance, 'source': 'stress'}
+                for category, content, keywords, importance in iter_extract(text)
+            ]
+            if options['bulk']:
+                calls = [lambda: ck.store.save_many(rows)]
+            else:
+                # Same per-line saves as save_conversation, retried line by line
+                calls = [lambda row=row: ck.store.save(**row) for row in rows]
+        else:
+            op = rng.choices([o for o, _ in mix], [w for _, w in mix])[0]
+            if op == 'search':
+                query = rng.choice(WORDS)
+                calls = [lambda: ck.search(query, options['limit'])]
+            else:
+                calls = [lambda: ck.get_summary(options['summary_days'])]
+
+        started = time.perf_counter()
+        cpu_started = time.process_time()
+        # Stop at the first call that gives up, so later lines are not saved
+        all(attempt(call) for call in calls)
+        elapsed = time.perf_counter() - started
+        latencies.setdefault(op, []).append(elapsed)
+        blocked[op] = blocked.get(op, 0.0) + max(
+            0.0, elapsed - (time.process_time() - cpu_started)
+        )
+
+        if interval:
+            next_at += interval
+            delay = next_at - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+
+    results.put({
+        'role': role,
+        'latencies': latencies,
+        'blocked': blocked,
+        'busy_retries': busy_retries,
+        'backoff_wait': backoff_wait,
+        'errors': errors,
+    })
+
+
+def _percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def run_stress(db_path: Path, writers: int = 4, readers: int = 4, duration: float = 10.0,
+               journal_mode: str = 'wal', mix: str = 'search=8,summary=2',
+               write_rate: float = 0, read_rate: float = 0, lines: int = 3,
+               bulk: bool = False, busy_timeout: float = DB_TIMEOUT, seed_rows: int = 0,
+               limit: int = 10, summary_days: int = 7, seed: int = 0,
+               crash_workers: int = 0) -> Dict[str, Any]:
+    """Run a load test and return the aggregated report.
+
+    Rates are operations per second per process (0 means unthrottled).
+    ``lines`` is the number of lines per saved conversation and ``bulk``
+    saves them in one transaction instead of one per line.
+    ``busy_timeout`` defaults to the app's; 0 makes SQLite fail fast so
+    the harness counts and retries every SQLITE_BUSY. The database's
+    journal mode is put back afterwards. ``crash_workers`` makes that
+    many workers raise at startup, to exercise crash reporting.
+    """
+    _parse_mix(mix)
+    db_utils.init_database(db_path)
+    with db_utils.get_connection(db_path) as conn:
+        original_mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+        mode = conn.execute(f"PRAGMA journal_mode = {journal_mode}").fetchone()[0]
+    try:
+        if seed_rows:
+            from storage import save_memories
+            rng = random.Random(seed)
+            save_memories(({'content': _sentence(rng),
+                            'keywords': ','.join(rng.sample(WORDS, 3))}
+                           for _ in range(seed_rows)), db_path)
+
+        options = {
+            'db_path': str(db_path), 'duration': duration, 'mix': mix,
+            'journal_mode': mode, 'write_rate': write_rate, 'read_rate': read_rate,
+            'lines': lines, 'bulk': bulk, 'busy_timeout': busy_timeout, 'limit': limit,
+            'summary_days': summary_days, 'seed': seed, 'crash_workers': crash_workers,
+            'start': time.monotonic() + 0.5,
+        }
+        reports, crashed = _run_workers(['writer'] * writers + ['reader'] * readers, options)
+    finally:
+        with db_utils.get_connection(db_path) as conn:
+            conn.execute(f"PRAGMA journal_mode = {original_mode}")
+
+    ops: Dict[str, List[float]] = {}
+    blocked: Dict[str, float] = {}
+    for report in reports:
+        for op, values in report['latencies'].items():
+            ops.setdefault(op, []).extend(values)
+            blocked[op] = blocked.get(op, 0.0) + report['blocked'][op]
+
+    summary = {}
+    for op, values in sorted(ops.items()):
+        values.sort()
+        summary[op] = {
+            'count': len(values),
+            'throughput': len(values) / duration,
+            'p50_ms': _percentile(values, 50) * 1000,
+            'p95_ms': _percentile(values, 95) * 1000,
+            'p99_ms': _percentile(values, 99) * 1000,
+            'max_ms': values[-1] * 1000,
+            'blocked_s': blocked[op],
+        }
+    return {
+        'journal_mode': mode,
+        'writers': writers,
+        'readers': readers,
+        'duration': duration,
+        'bulk': bulk,
+        'lines': lines,
+        'busy_timeout': busy_timeout,
+        'ops': summary,
+        'busy_retries': sum(r['busy_retries'] for r in reports),
+        'blocked_s': sum(blocked.values()),
+        'backoff_s': sum(r['backoff_wait'] for r in reports),
+        'errors': sum(r['errors'] for r in reports) + crashed,
+        'crashed_workers': crashed,
+    }
+
+
+def _run_workers(roles: List[str], options: Dict[str, Any]) -> Tuple[List[dict], int]:
+    """Run one worker process per role; returns their reports and the crash count."""
+    results = multiprocessing.Queue()
+    procs = [
+        multiprocessing.Process(target=_worker, args=(role, i, options, results))
+        for i, role in enumerate(roles)
+    ]
+    for proc in procs:
+        proc.start()
+
+    # A worker that dies never reports, so watch exit codes rather than
+    # blocking on the queue
+    reports = []
+    crashed = 0
+    give_up = options['start'] + options['duration'] + WORKER_GRACE
+    while len(reports) + crashed < len(procs):
+        try:
+            reports.append(results.get(timeout=0.5))
+        except queue.Empty:
+            if time.monotonic() > give_up:
+                for proc in procs:
+                    if proc.is_alive():
+                        proc.terminate()
+            for proc in procs:
+                proc.join(0)
+            crashed = sum(proc.exitcode not in (None, 0) for proc in procs)
+    for proc in procs:
+        proc.join()
+    return reports, crashed
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    """Render a report as a human-readable table."""
+    lines = [
+        f"journal_mode={report['journal_mode']} writers={report['writers']} "
+        f"readers={report['readers']} duration={report['duration']}s "
+        f"lines={report['lines']} bulk={report['bulk']} "
+        f"busy_timeout={report['busy_timeout']}s",
+        "",
+        f"{'op':<10}{'count':>8}{'ops/s':>10}{'p50 ms':>10}{'p95 ms':>10}"
+        f"{'p99 ms':>10}{'max ms':>10}{'blocked s':>11}",
+    ]
+    for op, s in report['ops'].items():
+        lines.append(
+            f"{op:<10}{s['count']:>8}{s['throughput']:>10.1f}{s['p50_ms']:>10.2f}"
+            f"{s['p95_ms']:>10.2f}{s['p99_ms']:>10.2f}{s['max_ms']:>10.2f}"
+            f"{s['blocked_s']:>11.2f}"
+        )
+    lines += [
+        "",
+        f"SQLITE_BUSY retries: {report['busy_retries']}",
+        f"Time blocked (locks and I/O): {report['blocked_s']:.2f}s, "
+        f"of which retry backoff: {report['backoff_s']:.2f}s",
+        f"Failed operations: {report['errors']}",
+        f"Crashed workers: {report['crashed_workers']}",
+    ]
+    return '\n'.join(lines)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Stress-test a shared ContextKeeper database')
+    parser.add_argument('--db', required=True, help='Database path (created if missing)')
+    parser.add_argument('-w', '--writers', type=int, default=4, help='Writer processes')
+    parser.add_argument('-r', '--readers', type=int, default=4, help='Reader processes')
+    parser.add_argument('-d', '--duration', type=float, default=10.0, help='Seconds to run')
+    parser.add_argument('--journal-mode', default='wal',
+                        choices=['wal', 'delete', 'truncate', 'persist', 'memory'])
+    parser.add_argument('--mix', default='search=8,summary=2',
+                        help='Reader operation weights, e.g. search=8,summary=2')
+    parser.add_argument('--write-rate', type=float, default=0,
+                        help='Saves per second per writer (0 = unthrottled)')
+    parser.add_argument('--read-rate', type=float, default=0,
+                        help='Reads per second per reader (0 = unthrottled)')
+    parser.add_argument('--lines', type=int, default=3, help='Lines per saved conversation')
+    parser.add_argument('--bulk', action='store_true',
+                        help='Save each conversation in one transaction')
+    parser.add_argument('--busy-timeout', type=float, default=DB_TIMEOUT,
+                        help='SQLite busy timeout in seconds (default: the app\'s); '
+                             '0 counts and retries every SQLITE_BUSY in the harness')
+    parser.add_argument('--seed-rows', type=int, default=0, help='Rows to preload')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed')
+    parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+
+    args = parser.parse_args()
+
+    try:
+        report = run_stress(
+            Path(args.db), args.writers, args.readers, args.duration,
+            journal_mode=args.journal_mode, mix=args.mix,
+            write_rate=args.write_rate, read_rate=args.read_rate,
+            lines=args.lines, bulk=args.bulk, busy_timeout=args.busy_timeout,
+            seed_rows=args.seed_rows, seed=args.seed
+        )
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    print(json.dumps(report, indent=2) if args.json else format_report(report))
+
+
+if __name__ == '__main__':
+    main()
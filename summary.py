@@ -4,26 +4,131 @@ import sys
 from datetime import datetime, timedelta
 from pathlib import Path
 from collections import Counter
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Iterable
 
 from config import DEFAULT_DB_PATH
-from db_utils import get_connection
+from db_utils import Memory, get_connection, query_memories, select_list
 
 
-def fetch_recent_memories(days: int = 7, db_path: Path = None) -> List[Dict[str, Any]]:
+SUMMARY_FIELDS = ('id', 'content', 'category', 'keywords', 'importance', 'timestamp')
+# Characters trimmed from topics: the ASCII whitespace str.strip() removes
+TOPIC_WHITESPACE = "char(9, 10, 11, 12, 13, 32)"
+
+
+def fetch_recent_memories(days: int = 7, db_path: Path = None) -> List[Memory]:
     """Fetch memories from the last N days."""
     with get_connection(db_path) as conn:
         cutoff = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d %H:%M:%S')
 
-        cursor = conn.execute(
+        cursor = query_memories(
+            conn,
             """SELECT id, content, category, keywords, importance, timestamp 
                FROM memories
                WHERE timestamp >= ?
                ORDER BY timestamp DESC""",
-            (cutoff,)
+            (cutoff,), db_path
+        )
+
+        return cursor.fetchall()
+
+
+def _cutoff(days: int) -> str:
+    return (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def fetch_window_stats(windows: Iterable[int], top_n: int = 5, display: int = 20,
+                       db_path: Path = None) -> Dict[int, Dict[str, Any]]:
+    """Compute totals, key topics and displayed rows for several windows at once.
+
+    Counting and topic extraction happen in SQL, and only the ``display``
+    most recent rows are fetched (with content cut to what the digest
+    renders), so memory use does not grow with the size of the window.
+    The largest window is scanned once; smaller windows are derived from
+    it with conditional aggregates. No windows gives empty stats.
+
+    Keywords are trimmed of ASCII whitespace only, and SQLite's lower()
+    only folds ASCII letters, so unlike str.strip()/str.lower() in
+    extract_key_topics, e.g. 'Été' and 'été' count as separate topics.
+    """
+    windows = sorted(set(windows))
+    if not windows:
+        return {}
+    cutoffs = [_cutoff(days) for days in windows]
+    widest = cutoffs[-1]
+    window_sums = ', '.join(f'SUM(timestamp >= ?) AS n{i}' for i in range(len(windows)))
+    window_ranks = ', '.join(
+        f'ROW_NUMBER() OVER (ORDER BY n{i} DESC, topic) AS r{i}'
+        for i in range(len(windows))
+    )
+    top_filter = ' OR '.join(f'r{i} <= {int(top_n)}' for i in range(len(windows)))
+
+    with get_connection(db_path) as conn:
+        totals = conn.execute(
+            f"SELECT {window_sums} FROM memories WHERE timestamp >= ?",
+            (*cutoffs, widest)
+        ).fetchone()
+
+        # Split the comma-separated keywords column with a recursive CTE
+        topic_rows = conn.execute(
+            f"""WITH RECURSIVE
+                   recent AS (
+                       SELECT timestamp, category, keywords FROM memories
+                       WHERE timestamp >= ?
+                   ),
+                   split(timestamp, word, rest) AS (
+                       SELECT timestamp, NULL, keywords || ',' FROM recent
+                       WHERE keywords IS NOT NULL
+                       UNION ALL
+                       SELECT timestamp,
+                              substr(rest, 1, instr(rest, ',') - 1),
+                              substr(rest, instr(rest, ',') + 1)
+                       FROM split WHERE rest <> ''
+                   ),
+                   topics(timestamp, topic) AS (
+                       SELECT timestamp, lower(trim(word, {TOPIC_WHITESPACE})) FROM split
+                       WHERE word IS NOT NULL
+                       UNION ALL
+                       SELECT timestamp, lower(category) FROM recent
+                   ),
+                   counts AS (
+                       SELECT topic, {window_sums} FROM topics
+                       WHERE topic IS NOT NULL AND topic <> ''
+                       GROUP BY topic
+                   ),
+                   ranked AS (
+                       SELECT *, {window_ranks} FROM counts
+                   )
+               SELECT * FROM ranked WHERE {top_filter}""",
+            (widest, *cutoffs)
         )
+        topics = [[] for _ in windows]
+        for row in topic_rows:
+            for i, bucket in enumerate(topics):
+                rank = row[f'r{i}']
+                if row[f'n{i}'] and rank <= top_n:
+                    bucket.append((rank, row['topic']))
+
+        cursor = query_memories(
+            conn,
+            f"""SELECT {select_list(SUMMARY_FIELDS, truncate=151)}
+               FROM memories
+               WHERE timestamp >= ?
+               ORDER BY timestamp DESC
+               LIMIT ?""",
+            (widest, display), db_path, truncate=151
+        )
+        shown = cursor.fetchall()
 
-        return [dict(row) for row in cursor.fetchall()]
+    stats = {}
+    for days, cutoff, total, ranked in zip(windows, cutoffs, totals, topics):
+        stats[days] = {
+            'total': total or 0,
+            'topics': [t for _, t in sorted(ranked)],
+            # Rows are ordered newest first, so a narrower window's
+            # most recent rows are a prefix of the widest window's
+            'memories': [m for m in shown if m['timestamp'] >= cutoff],
+        }
+    return stats
 
 
 def extract_key_topics(memories: List[Dict[str, Any]], top_n: int = 5) -> List[str]:
@@ -40,17 +145,26 @@ def extract_key_topics(memories: List[Dict[str, Any]], top_n: int = 5) -> List[s
     return [t for t, _ in topic_counts.most_common(top_n)]
 
 
-def generate_summary_text(memories: List[Dict[str, Any]], days: int) -> str:
-    """Generate a human-readable summary text."""
+def generate_summary_text(memories: List[Dict[str, Any]], days: int,
+                          total: Optional[int] = None,
+                          key_topics: Optional[List[str]] = None) -> str:
+    """Generate a human-readable summary text.
+
+    ``total`` and ``key_topics`` default to values computed from
+    ``memories``; pass them when they were aggregated elsewhere.
+    """
     if not memories:
         return f"No memories recorded in the last {days} days."
 
-    key_topics = extract_key_topics(memories)
+    if key_topics is None:
+        key_topics = extract_key_topics(memories)
+    if total is None:
+        total = len(memories)
 
     lines = [
         f"# Memory Digest: Last {days} Days",
         "",
-        f"**Total Memories:** {len(memories)}",
+        f"**Total Memories:** {total}",
         f"**Key Topics:** {', '.join(key_topics) if key_topics else 'None identified'}",
         "",
         "## Recent Memories",
@@ -79,8 +193,15 @@ class SummaryGenerator:
 
     def generate(self, days: int = 7) -> str:
         """Generate summary for the last N days."""
-        memories = fetch_recent_memories(days, self.db_path)
-        return generate_summary_text(memories, days)
+        return self.generate_many([days])[days]
+
+    def generate_many(self, windows: Iterable[int] = (7, 30, 90)) -> Dict[int, str]:
+        """Generate summaries for several windows in a single pass."""
+        stats = fetch_window_stats(windows, db_path=self.db_path)
+        return {
+            days: generate_summary_text(s['memories'], days, s['total'], s['topics'])
+            for days, s in stats.items()
+        }
 
 
 def main():
@@ -11,7 +11,7 @@ from pathlib import Path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from config import DEFAULT_DB_PATH
-from db_utils import get_connection, init_database, search_fts
+from db_utils import Memory, get_connection, init_database, search_fts
 from extractor import process_text, categorize_content, extract_keywords
 from storage import MemoryStore, save_memory
 from query import QueryEngine, search_memories
@@ -118,6 +118,409 @@ class TestStorage(unittest.TestCase):
         memory = self.store.get(memory_id)
         self.assertEqual(memory['content'], "Test content")
 
+    def test_get_many_preserves_order(self):
+        ids = [self.store.save(f"Memory {i}") for i in range(5)]
+        wanted = [ids[3], 999, ids[0], ids[3]]
+        rows = self.store.get_many(wanted)
+        self.assertEqual([r and r['content'] for r in rows],
+                         ["Memory 3", None, "Memory 0", "Memory 3"])
+
+        self.store.get_many(wanted)
+        stats = self.store.cache_stats()
+        self.assertEqual(stats['size'], 2)
+        self.assertEqual(stats['hits'], 2)
+
+    def test_cache_invalidated_on_update_and_delete(self):
+        first = self.store.save("Original")
+        second = self.store.save("Doomed")
+        self.store.get_many([first, second])
+
+        with get_connection(self.db_path) as conn:
+            conn.execute("UPDATE memories SET content = 'Edited' WHERE id = ?", (first,))
+            conn.execute("DELETE FROM memories WHERE id = ?", (second,))
+
+        rows = self.store.get_many([first, second])
+        self.assertEqual(rows[0]['content'], "Edited")
+        self.assertIsNone(rows[1])
+        self.assertEqual(self.store.cache_stats()['invalidations'], 2)
+
+    def test_cache_is_bounded(self):
+        store = MemoryStore(self.db_path, cache_size=3)
+        ids = [self.store.save(f"Memory {i}") for i in range(10)]
+        store.get_many(ids)
+        stats = store.cache_stats()
+        self.assertEqual(stats['size'], 3)
+        self.assertEqual(stats['evictions'], 7)
+
+    def test_memory_records_copy_and_pickle(self):
+        import copy
+        import pickle
+        from storage import load_memory
+        memory = load_memory(self.store.save("Pickled note"), self.db_path)
+        memory['score'] = 1.0
+        for clone in (copy.copy(memory), copy.deepcopy(memory),
+                      pickle.loads(pickle.dumps(memory))):
+            self.assertEqual(clone, memory)
+            self.assertEqual(clone.content, "Pickled note")
+        clone = copy.copy(memory)
+        clone['score'] = 2.0
+        self.assertEqual(memory['score'], 1.0)
+
+    def test_save_many_bulk_indexes_fts(self):
+        self.store.save("Existing Python note")
+        count = self.store.save_many([
+            {'content': f"Bulk Python row {i}", 'importance': '7'} for i in range(50)
+        ])
+        self.assertEqual(count, 50)
+        self.assertEqual(len(self.store.search_fts("Python", limit=100)), 51)
+
+        # Triggers are restored, so later single saves are indexed again
+        self.store.save("Trailing Python note")
+        self.assertEqual(len(self.store.search_fts("Python", limit=100)), 52)
+
+    def test_bulk_load_rolls_back_on_error(self):
+        from db_utils import bulk_load
+        with self.assertRaises(RuntimeError):
+            with bulk_load(self.db_path) as conn:
+                conn.execute("INSERT INTO memories (content) VALUES ('lost')")
+                raise RuntimeError("boom")
+        with get_connection(self.db_path) as conn:
+            triggers = conn.execute(
+                "SELECT COUNT(*) FROM sqlite_master "
+                "WHERE type='trigger' AND name LIKE 'memories_fts_%'"
+            ).fetchone()[0]
+            rows = conn.execute("SELECT COUNT(*) FROM memories").fetchone()[0]
+        self.assertEqual(triggers, 3)
+        self.assertEqual(rows, 0)
+
+    def test_changes_since(self):
+        first = self.store.save("First")
+        second = self.store.save("Second")
+        changes, watermark = self.store.changes_since(0)
+        self.assertEqual([c['id'] for c in changes], [first, second])
+        self.assertEqual(changes[0]['content'], "First")
+
+        with get_connection(self.db_path) as conn:
+            conn.execute("UPDATE memories SET content = 'Edited' WHERE id = ?", (first,))
+            conn.execute("DELETE FROM memories WHERE id = ?", (second,))
+        changes, watermark = self.store.changes_since(watermark)
+        self.assertEqual([(c['op'], c['id']) for c in changes],
+                         [('update', first), ('delete', second)])
+        self.assertEqual(changes[0]['content'], "Edited")
+        self.assertEqual(self.store.changes_since(watermark), ([], watermark))
+
+    def test_prune_changes(self):
+        from related import refresh_keyword_index
+        ids = [save_memory(f"Memory {i}", db_path=self.db_path) for i in range(5)]
+        self.store.get_many(ids)
+        refresh_keyword_index(self.db_path, limit=3)
+        # Entries the keyword index has not applied yet are kept
+        self.assertEqual(self.store.prune_changes(4), 3)
+        self.assertEqual([c['id'] for c in self.store.changes_since(0)[0]], ids[3:])
+
+        with get_connection(self.db_path) as conn:
+            conn.execute("UPDATE memories SET content = 'Edited' WHERE id = ?", (ids[0],))
+            conn.execute("UPDATE memories SET content = 'Edited' WHERE id = ?", (ids[1],))
+        refresh_keyword_index(self.db_path)
+        # The newest entry is kept so the head watermark survives
+        self.assertEqual(self.store.prune_changes(100), 3)
+        init_database(self.db_path)
+        changes, _ = self.store.changes_since(0)
+        self.assertEqual([(c['op'], c['id'], c['seq']) for c in changes],
+                         [('update', ids[1], 7)])
+
+        # The cache missed the pruned update to ids[0], so it starts over
+        self.assertEqual(self.store.get(ids[0])['content'], "Edited")
+        with self.assertRaises(ValueError):
+            self.store.snapshot(Path(self.temp_dir) / 'delta.db', since=5)
+        self.assertFalse((Path(self.temp_dir) / 'delta.db').exists())
+
+    def test_wait_for_changes(self):
+        import threading
+        from storage import wait_for_changes
+        _, watermark = self.store.changes_since(0)
+        self.assertFalse(wait_for_changes(watermark, timeout=0.1, db_path=self.db_path))
+
+        timer = threading.Timer(0.1, self.store.save, args=("Late",))
+        timer.start()
+        try:
+            self.assertTrue(wait_for_changes(watermark, timeout=5, db_path=self.db_path))
+        finally:
+            timer.join()
+        batches = list(self.store.follow(watermark, timeout=0))
+        self.assertEqual([c['content'] for c in batches[0]], ["Late"])
+
+    def test_snapshot_and_restore_with_delta(self):
+        first = self.store.save("Kept Python note")
+        second = self.store.save("Note to delete")
+        full = Path(self.temp_dir) / 'full.db'
+        self.assertEqual(self.store.snapshot(full), 2)
+
+        self.store.save("New Python note")
+        with get_connection(self.db_path) as conn:
+            conn.execute("UPDATE memories SET content = 'Edited Python note' WHERE id = ?", (first,))
+            conn.execute("DELETE FROM memories WHERE id = ?", (second,))
+        delta = Path(self.temp_dir) / 'delta.db'
+        self.assertEqual(self.store.snapshot(delta, since=full), 5)
+
+        restored = MemoryStore(Path(self.temp_dir) / 'restored.db')
+        self.assertEqual(restored.restore(full, [delta]), 5)
+        self.assertEqual(
+            sorted(m['content'] for m in restored.search_fts("Python")),
+            ["Edited Python note", "New Python note"]
+        )
+        self.assertIsNone(restored.get(second))
+
+        with self.assertRaises(ValueError):
+            restored.restore(delta)
+        with self.assertRaises(ValueError):
+            restored.restore(full, [delta, delta])
+
+    def test_snapshot_under_steady_writes(self):
+        import threading
+        from backup import snapshot, snapshot_watermark
+        self.store.save_many([{'content': f"Filler {i} " + "x" * 2000} for i in range(300)])
+        stop = threading.Event()
+
+        def writer():
+            while not stop.is_set():
+                self.store.save("Concurrent write")
+                stop.wait(0.01)
+
+        thread = threading.Thread(target=writer)
+        thread.start()
+        try:
+            # Every write restarts the paced copy; it must still finish
+            full = Path(self.temp_dir) / 'full.db'
+            watermark = snapshot(self.db_path, full, pages=5, pause=0.01,
+                                 max_restarts=2, timeout=30)
+        finally:
+            stop.set()
+            thread.join()
+        self.assertEqual(snapshot_watermark(full), watermark)
+        with get_connection(full) as conn:
+            self.assertEqual(conn.execute("SELECT COUNT(*) FROM memories").fetchone()[0],
+                             watermark)
+
+    def test_restore_continues_change_log(self):
+        from backup import snapshot_watermark
+        memory_id = self.store.save("Draft")
+        full = Path(self.temp_dir) / 'full.db'
+        base = self.store.snapshot(full)
+        with get_connection(self.db_path) as conn:
+            for i in range(10):
+                conn.execute("UPDATE memories SET content = ? WHERE id = ?",
+                             (f"Draft {i}", memory_id))
+        delta = Path(self.temp_dir) / 'delta.db'
+        watermark = self.store.snapshot(delta, since=full)
+        self.assertEqual(watermark, base + 10)
+
+        restored = MemoryStore(Path(self.temp_dir) / 'restored.db')
+        self.assertEqual(restored.restore(full, [delta]), watermark)
+        self.assertEqual(snapshot_watermark(restored.db_path), watermark)
+        later = restored.save("After restore")
+        changes, _ = restored.changes_since(watermark)
+        self.assertEqual([c['id'] for c in changes], [later])
+
+
+class TestCompression(unittest.TestCase):
+    """Tests for compressed content storage."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.db_path = Path(self.temp_dir) / 'test.db'
+        self.store = MemoryStore(self.db_path)
+        self.store.init()
+        self.document = "Pasted document about SQLite page caches. " * 200
+
+    def tearDown(self):
+        import shutil
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_large_content_is_stored_compressed(self):
+        memory_id = self.store.save(self.document)
+        small_id = self.store.save("Short SQLite note")
+        with get_connection(self.db_path) as conn:
+            types = dict(conn.execute("SELECT id, typeof(content) FROM memories"))
+        self.assertEqual(types, {memory_id: 'blob', small_id: 'text'})
+
+        self.assertEqual(self.store.get(memory_id)['content'], self.document)
+        results = QueryEngine(self.db_path).search_many(
+            ["caches"], truncate=15, snippet=True
+        )[0]
+        self.assertEqual(results[0]['content'], "Pasted document")
+        self.assertIn("[caches]", results[0]['snippet'])
+        filtered = QueryEngine(self.db_path).search_many(["content:cach*"], snippet=True)[0]
+        self.assertIn("[caches]", filtered[0]['snippet'])
+        self.assertEqual(len(self.store.search("page caches")), 1)
+
+    def test_compress_existing_with_dictionary(self):
+        from storage import compress_existing
+        with get_connection(self.db_path) as conn:
+            conn.execute("INSERT INTO memories (content) VALUES (?)", (self.document,))
+        watermark = self.store.changes_since(0)[1]
+
+        self.assertEqual(compress_existing(self.db_path, train=True), 1)
+        # Rewriting the encoding is not a change to the memory
+        self.assertEqual(self.store.changes_since(watermark), ([], watermark))
+        with get_connection(self.db_path) as conn:
+            conn.execute(
+                "INSERT INTO memories_fts(memories_fts, rank) VALUES ('integrity-check', 1)"
+            )
+        stats = self.store.compression_stats()
+        self.assertEqual(stats['compressed_rows'], 1)
+        self.assertEqual(stats['raw_bytes'], len(self.document))
+        self.assertGreater(stats['ratio'], 10)
+        self.assertEqual(self.store.search_fts("caches")[0]['content'], self.document)
+        # Already encoded with the current dictionary, so nothing to redo
+        self.assertEqual(compress_existing(self.db_path), 0)
+
+    def test_plain_connection_can_write(self):
+        import sqlite3
+        snippet_sql = ("SELECT snippet(memories_fts, 0, '[', ']', '...', 8) FROM memories_fts "
+                       "WHERE memories_fts MATCH 'plain'")
+        conn = sqlite3.connect(str(self.db_path))
+        try:
+            conn.execute("INSERT INTO memories (content) VALUES ('Plain SQLite caches note')")
+            conn.commit()
+            # Without compressed rows the content view is plain SQL
+            self.assertEqual(conn.execute(snippet_sql).fetchall(),
+                             [("[Plain] SQLite caches note",)])
+
+            self.store.save(self.document)
+            conn.execute("INSERT INTO memories (content) VALUES ('Plain page note')")
+            conn.commit()
+            self.assertEqual(len(conn.execute(
+                "SELECT rowid FROM memories_fts WHERE memories_fts MATCH 'caches'"
+            ).fetchall()), 2)
+            # Now the view decompresses, which needs ck_decompress
+            with self.assertRaises(sqlite3.OperationalError):
+                conn.execute(snippet_sql).fetchall()
+        finally:
+            conn.close()
+
+        self.assertEqual(len(self.store.search_fts("page")), 2)
+        with get_connection(self.db_path) as conn:
+            conn.execute(
+                "INSERT INTO memories_fts(memories_fts, rank) VALUES ('integrity-check', 1)"
+            )
+            snippets = [row[0] for row in conn.execute(
+                "SELECT snippet(memories_fts, 0, '[', ']', '...', 4) FROM memories_fts "
+                "WHERE memories_fts MATCH 'pasted OR plain'"
+            )]
+        self.assertEqual(len(snippets), 3)
+        self.assertTrue(all('[' in s for s in snippets))
+
+    def test_restore_delta_with_new_dictionary(self):
+        from storage import compress_existing
+        self.store.save("Short note")
+        full = Path(self.temp_dir) / 'full.db'
+        self.store.snapshot(full)
+
+        memory_id = self.store.save(self.document)
+        compress_existing(self.db_path, train=True)
+        delta = Path(self.temp_dir) / 'delta.db'
+        self.store.snapshot(delta, since=full)
+
+        restored = MemoryStore(Path(self.temp_dir) / 'restored.db')
+        restored.restore(full, [delta])
+        self.assertEqual(restored.get(memory_id)['content'], self.document)
+        self.assertEqual(restored.search_fts("caches")[0]['id'], memory_id)
+
+    def test_migrates_old_fts_schema(self):
+        import sqlite3
+        old_path = Path(self.temp_dir) / 'old.db'
+        conn = sqlite3.connect(str(old_path))
+        conn.executescript("""
+            CREATE TABLE memories (
+                id INTEGER PRIMARY KEY AUTOINCREMENT, content TEXT NOT NULL,
+                source TEXT DEFAULT 'manual', category TEXT, keywords TEXT,
+                importance INTEGER DEFAULT 5, session_key TEXT,
+                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+            );
+            CREATE VIRTUAL TABLE memories_fts USING fts5(
+                content, content='memories', content_rowid='id'
+            );
+            INSERT INTO memories (content) VALUES ('Legacy Python memory');
+            INSERT INTO memories_fts (rowid, content) VALUES (1, 'Legacy Python memory');
+        """)
+        conn.close()
+
+        init_database(old_path)
+        save_memory(self.document, db_path=old_path)
+        self.assertEqual(len(search_fts("Python", db_path=old_path)), 1)
+        self.assertEqual(len(search_fts("caches", db_path=old_path)), 1)
+
+
+class TestColumnar(unittest.TestCase):
+    """Tests for columnar snapshots."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.db_path = Path(self.temp_dir) / 'test.db'
+        self.snapshot_path = Path(self.temp_dir) / 'recent.col'
+        self.store = MemoryStore(self.db_path)
+        self.store.init()
+        self.store.save("Python web development", category="code", keywords="python,web")
+        self.store.save("Machine learning with Python", keywords="ml")
+        self.store.save("Ünïcode notes about SQLite " + "x" * 5000, importance="9")
+
+    def tearDown(self):
+        import shutil
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_matches_query_engine_shape(self):
+        from columnar import SnapshotReader
+        self.assertEqual(self.store.export_columnar(self.snapshot_path), 3)
+        engine = QueryEngine(self.db_path)
+        with SnapshotReader(self.snapshot_path) as reader:
+            self.assertEqual(len(reader), 3)
+            recent = reader.get_recent(10)
+            by_id = lambda m: m['id']
+            self.assertEqual(sorted(recent, key=by_id),
+                             sorted(engine.get_recent(10), key=by_id))
+            self.assertEqual(list(recent[0]), list(engine.search("Python")[0]))
+
+            self.assertEqual(len(reader.search("python")), 2)
+            self.assertEqual([m['id'] for m in reader.search("python learning")], [2])
+            self.assertEqual(reader.search("web")[0]['category'], "code")
+            self.assertIsNone(reader.search("machine")[0]['category'])
+            self.assertEqual(reader.search("ünïcode")[0]['importance'], 9)
+            self.assertEqual(reader.search("missing"), [])
+
+    def test_importance_values(self):
+        from columnar import SnapshotReader
+        high = save_memory("Extractor note", importance='high', db_path=self.db_path)
+        with get_connection(self.db_path) as conn:
+            unset = conn.execute(
+                "INSERT INTO memories (content, importance) VALUES ('No importance', NULL)"
+            ).lastrowid
+            scaled = conn.execute(
+                "INSERT INTO memories (content, importance) VALUES ('Scaled', 7.5)"
+            ).lastrowid
+        self.store.export_columnar(self.snapshot_path)
+        engine = QueryEngine(self.db_path)
+        with SnapshotReader(self.snapshot_path) as reader:
+            rows = {m['id']: m['importance'] for m in reader.get_recent(10)}
+            self.assertEqual(rows, {m['id']: m['importance'] for m in engine.get_recent(10)})
+            # A held postings view keeps the mapping alive past close()
+            postings = reader.postings("note")
+        self.assertEqual(len(postings), 1)
+        postings.release()
+        self.assertEqual(rows[high], 'high')
+        self.assertEqual(rows[scaled], 7.5)
+        self.assertIsNone(rows[unset])
+        self.assertIsNone(self.store.get(unset)['importance'])
+
+    def test_limit_and_bad_file(self):
+        from columnar import SnapshotReader
+        self.store.export_columnar(self.snapshot_path, limit=1)
+        with SnapshotReader(self.snapshot_path) as reader:
+            self.assertEqual([m['id'] for m in reader.get_recent()], [3])
+
+        with self.assertRaises(ValueError):
+            SnapshotReader(self.db_path)
+
 
 class TestQuery(unittest.TestCase):
     """Tests for query module."""
@@ -146,6 +549,233 @@ class TestQuery(unittest.TestCase):
         results = engine.search("Python")
         self.assertGreaterEqual(len(results), 1)
 
+    def test_search_many(self):
+        engine = QueryEngine(self.db_path)
+        results = engine.search_many(["Python", "development OR tips", "nothing"])
+        self.assertEqual([len(r) for r in results], [1, 2, 0])
+
+        deduped = engine.search_many(["Python", "development OR tips"], dedupe=True)
+        self.assertEqual([m['content'] for m in deduped[1]],
+                         ["Database optimization tips"])
+
+    def test_related(self):
+        from related import refresh_keyword_index
+        engine = QueryEngine(self.db_path)
+        source = save_memory("SQLite tuning", keywords="sqlite,wal,fts", db_path=self.db_path)
+        close = save_memory("WAL and FTS", keywords="wal,fts", db_path=self.db_path)
+        loose = save_memory("More SQLite", keywords="sqlite,vacuum", db_path=self.db_path)
+        # Shares no keyword with the source; reached because 'vacuum'
+        # co-occurs with 'sqlite'
+        cousin = save_memory("Vacuum schedule", keywords="vacuum,cron", db_path=self.db_path)
+        save_memory("Unrelated", keywords="cooking", db_path=self.db_path)
+        refresh_keyword_index(self.db_path)
+
+        related = engine.related(source, k=5)
+        self.assertEqual([m['id'] for m in related], [close, loose, cousin])
+        self.assertGreater(related[0]['score'], related[1]['score'])
+        self.assertEqual(len(engine.related(source, k=1)), 1)
+
+        # Updates and deletes are picked up from the change log
+        with get_connection(self.db_path) as conn:
+            conn.execute("UPDATE memories SET keywords = 'cooking' WHERE id = ?", (close,))
+            conn.execute("DELETE FROM memories WHERE id = ?", (loose,))
+        refresh_keyword_index(self.db_path)
+        self.assertEqual(engine.related(source), [])
+        self.assertEqual(engine.related(cousin), [])
+
+    def test_related_expands_cooccurring_keywords(self):
+        from related import refresh_keyword_index
+        engine = QueryEngine(self.db_path)
+        a = save_memory("A", keywords="sqlite,wal", db_path=self.db_path)
+        b = save_memory("B", keywords="sqlite,wal", db_path=self.db_path)
+        c = save_memory("C", keywords="wal", db_path=self.db_path)
+        self.assertEqual(refresh_keyword_index(self.db_path), 3)
+        self.assertEqual(refresh_keyword_index(self.db_path), 0)
+
+        source = save_memory("D", keywords="sqlite", db_path=self.db_path)
+        refresh_keyword_index(self.db_path)
+        related = engine.related(source)
+        # c shares no keyword but 'wal' co-occurs with 'sqlite'
+        self.assertEqual([m['id'] for m in related], [b, a, c])
+
+    def test_related_keyword_index_catch_up(self):
+        import sqlite3
+        from related import refresh_keyword_index
+        engine = QueryEngine(self.db_path)
+        store = MemoryStore(self.db_path, related_refresh=2)
+        source = store.save("Source", keywords="sqlite,wal")
+        store.save_many([{'content': f"Bulk {i}", 'keywords': "sqlite"} for i in range(20)])
+        # Writes through the store index their own rows
+        self.assertEqual(refresh_keyword_index(self.db_path), 0)
+
+        # Writes from elsewhere are not indexed until a refresh
+        for i in range(5):
+            save_memory(f"Single {i}", keywords="wal", db_path=self.db_path)
+        self.assertEqual(len(engine.related(source, k=50)), 20)
+        # A store write applies its own entry plus two more, oldest first
+        store.save("Other", keywords="cooking")
+        self.assertEqual(len(engine.related(source, k=50)), 23)
+        self.assertEqual(refresh_keyword_index(self.db_path, limit=1, batch=1), 1)
+        self.assertEqual(store.refresh_related(), 2)
+
+        # related() never writes, so it answers while writes are locked out
+        blocker = sqlite3.connect(str(self.db_path))
+        blocker.execute("BEGIN IMMEDIATE")
+        try:
+            self.assertEqual(len(engine.related(source, k=50)), 25)
+        finally:
+            blocker.rollback()
+            blocker.close()
+
+    def test_projection_and_snippet(self):
+        engine = QueryEngine(self.db_path)
+        rows = list(engine.iter_search(
+            "Python", fields=['id', 'content'], truncate=6, snippet=True
+        ))
+        self.assertEqual(rows, [{'id': 1, 'content': 'Python',
+                                 'snippet': '[Python] web development'}])
+
+        recent = list(engine.iter_recent(fields=['category']))
+        self.assertEqual(len(recent), 3)
+        self.assertEqual(set(recent[0]), {'category'})
+
+        with self.assertRaises(ValueError):
+            list(engine.iter_recent(fields=['password']))
+
+    def test_write_ndjson(self):
+        import io
+        import json
+        from main import write_results
+        out = io.StringIO()
+        write_results(QueryEngine(self.db_path).iter_recent(fields=['id']), 'ndjson', out)
+        lines = out.getvalue().splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertEqual(set(json.loads(lines[0])), {'id'})
+
+    def test_memory_records(self):
+        import json
+        from main import write_results
+        import io
+        from query import get_recent_memories
+        memory = get_recent_memories(1, self.db_path)[0]
+        self.assertFalse(hasattr(memory, '__dict__'))
+        self.assertEqual(memory.content, memory['content'])
+        self.assertEqual(dict(memory), memory.to_dict())
+
+        copy = memory.copy()
+        copy['score'] = 1.5
+        copy['category'] = 'changed'
+        self.assertEqual(copy['score'], 1.5)
+        self.assertNotIn('score', memory)
+        self.assertNotEqual(memory['category'], 'changed')
+
+        out = io.StringIO()
+        write_results([copy], 'json', out)
+        self.assertEqual(json.loads(out.getvalue())[0], copy.to_dict())
+
+        # The high-level API hands out Memory records, converted only on output
+        engine = QueryEngine(self.db_path)
+        self.assertIsInstance(engine.get_recent(1)[0], Memory)
+        out = io.StringIO()
+        write_results(engine.iter_search("Python"), 'ndjson', out)
+        self.assertEqual([json.loads(line)['id'] for line in out.getvalue().splitlines()],
+                         [m['id'] for m in engine.search("Python")])
+
+
+class TestSummary(unittest.TestCase):
+    """Tests for summary module."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.db_path = Path(self.temp_dir) / 'test.db'
+        init_database(self.db_path)
+
+        with get_connection(self.db_path) as conn:
+            for days_ago, category, keywords in [
+                (1, 'code', 'python, sqlite'),
+                (2, 'code', 'python'),
+                (20, 'ai', 'models,python'),
+                (60, 'ai', 'models'),
+                (400, 'old', 'ancient'),
+            ]:
+                conn.execute(
+                    """INSERT INTO memories (content, category, keywords, timestamp)
+                       VALUES (?, ?, ?, datetime('now', 'localtime', ?))""",
+                    (f"{category} memory", category, keywords, f"-{days_ago} days")
+                )
+
+    def tearDown(self):
+        import shutil
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_window_stats(self):
+        from summary import fetch_window_stats
+        stats = fetch_window_stats([7, 30, 90], top_n=2, db_path=self.db_path)
+        self.assertEqual([stats[d]['total'] for d in (7, 30, 90)], [2, 3, 4])
+        self.assertEqual(stats[7]['topics'], ['code', 'python'])
+        self.assertEqual(stats[90]['topics'], ['python', 'ai'])
+        self.assertEqual(len(stats[30]['memories']), 3)
+        self.assertEqual(fetch_window_stats([], db_path=self.db_path), {})
+
+        # Keywords are trimmed of any ASCII whitespace, as str.strip() would
+        with get_connection(self.db_path) as conn:
+            conn.execute("INSERT INTO memories (content, keywords) "
+                         "VALUES ('x', 'sqlite,\tsqlite\n')")
+        stats = fetch_window_stats([7], top_n=1, db_path=self.db_path)
+        self.assertEqual(stats[7]['topics'], ['sqlite'])
+
+    def test_generate_many_matches_generate(self):
+        sg = SummaryGenerator(self.db_path)
+        digests = sg.generate_many((7, 30))
+        self.assertEqual(digests[7], sg.generate(7))
+        self.assertIn("**Total Memories:** 3", digests[30])
+
+
+class TestStress(unittest.TestCase):
+    """Tests for the stress harness."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.db_path = Path(self.temp_dir) / 'test.db'
+
+    def tearDown(self):
+        import shutil
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_run_stress_reports_all_ops(self):
+        from stress import run_stress, format_report
+        report = run_stress(self.db_path, writers=1, readers=1, duration=0.5,
+                            mix='search=1,summary=1', seed_rows=20)
+        self.assertEqual(report['journal_mode'], 'wal')
+        # The database's own journal mode is put back afterwards
+        with get_connection(self.db_path) as conn:
+            self.assertEqual(conn.execute("PRAGMA journal_mode").fetchone()[0], 'delete')
+        self.assertEqual(report['errors'], 0)
+        self.assertGreater(report['ops']['save']['count'], 0)
+        self.assertIn('search', report['ops'])
+        self.assertIn('SQLITE_BUSY retries', format_report(report))
+
+    def test_busy_retries_do_not_duplicate_rows(self):
+        from stress import run_stress
+        report = run_stress(self.db_path, writers=3, readers=0, duration=0.5, lines=3,
+                            busy_timeout=0)
+        with get_connection(self.db_path) as conn:
+            rows = conn.execute("SELECT COUNT(*) FROM memories").fetchone()[0]
+        self.assertGreater(rows, 0)
+        self.assertLessEqual(rows, report['ops']['save']['count'] * 3)
+
+    def test_crashed_worker_is_reported(self):
+        from stress import run_stress
+        report = run_stress(self.db_path, writers=1, readers=1, duration=0.2,
+                            crash_workers=2)
+        self.assertEqual(report['crashed_workers'], 2)
+        self.assertEqual(report['errors'], 2)
+
+    def test_rejects_unknown_read_op(self):
+        from stress import run_stress
+        with self.assertRaises(ValueError):
+            run_stress(self.db_path, mix='delete=1')
+
 
 class TestIntegration(unittest.TestCase):
     """Integration tests for ContextKeeper."""